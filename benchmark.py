@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks FEN parsing and SVG/PNG rendering."""
+
+import pdraughts
+import draughts_svg
+import draughts_png
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+
+FENS = {
+    8: "W:W21,22,23,K25,26,28,29,30,31,32:B1,2,3,5,6,7,9,10,K12,13",
+    10: "W:W27,28,31,32,33,34,35,36,37,38,39,40,41,42,K43,44,45,46,47,48:B1,2,3,4,5,6,7,8,9,10,11,12,K13,14,15,16,17,18,19,20",
+}
+
+LASTMOVES = {8: "2217", 10: "3227"}
+
+ARROWS = {
+    8: [draughts_svg.Arrow(22, 18), draughts_svg.Arrow(9, 14), draughts_svg.Arrow(13, 13)],
+    10: [draughts_svg.Arrow(32, 28), draughts_svg.Arrow(17, 22), draughts_svg.Arrow(19, 19)],
+}
+
+PNG_SIZES = [180, 360, 720]
+
+
+def cases():
+    """Yields the name and function of every benchmark."""
+    for board_size, fen in sorted(FENS.items()):
+        yield "parse/base/%d" % board_size, lambda fen=fen, board_size=board_size: pdraughts.BaseBoard(fen, board_size=board_size)
+        yield "parse/array/%d" % board_size, lambda fen=fen, board_size=board_size: pdraughts.ArrayBoard(fen, board_size=board_size)
+
+    for board_size, fen in sorted(FENS.items()):
+        board = pdraughts.ArrayBoard(fen, board_size=board_size)
+        for flipped in [False, True]:
+            orientation = "black" if flipped else "white"
+            yield "svg/%d/%s" % (board_size, orientation), lambda board=board, flipped=flipped: draughts_svg.board(board, flipped=flipped)
+            yield "svg/%d/%s/annotated" % (board_size, orientation), lambda board=board, flipped=flipped, board_size=board_size: draughts_svg.board(
+                board, flipped=flipped, lastmove=LASTMOVES[board_size], arrows=ARROWS[board_size])
+
+    for symbol in "MKmk":
+        yield "piece/%s" % symbol, lambda symbol=symbol: draughts_svg.piece(pdraughts.Piece.from_symbol(symbol))
+
+    board = pdraughts.ArrayBoard(FENS[10])
+    svg = draughts_svg.board(board, lastmove=LASTMOVES[10])
+    for size in PNG_SIZES:
+        sized = svg.replace('viewBox="0 0 450 450"', 'viewBox="0 0 450 450" width="%d" height="%d"' % (size, size), 1)
+        yield "png/cairosvg/%d" % size, lambda sized=sized: draughts_png.svg2png(sized)
+        yield "png/direct/%d" % size, lambda size=size: draughts_png.board(board, lastmove=LASTMOVES[10], size=size)
+
+
+def matches(name, pattern):
+    """
+    Checks if a pattern selects a benchmark, either as the leading part of
+    its name, like ``svg/10``, or as one of its segments, like ``direct``.
+    """
+    parts = name.split("/")
+    leading = pattern.strip("/").split("/")
+    return parts[:len(leading)] == leading or pattern in parts
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(func, duration, min_runs=5):
+    """
+    Runs a benchmark for at least *duration* seconds and returns its
+    throughput, latency percentiles in microseconds and the peak memory
+    allocated by a single run.
+    """
+    # Warm up caches and measure allocations outside of the timed runs.
+    func()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = []
+    clock = time.perf_counter
+    start = clock()
+    while len(samples) < min_runs or clock() - start < duration:
+        begin = clock()
+        func()
+        samples.append(clock() - begin)
+    total = clock() - start
+
+    samples.sort()
+    return {
+        "runs": len(samples),
+        "ops": len(samples) / total,
+        "p50_us": percentile(samples, 0.5) * 1e6,
+        "p90_us": percentile(samples, 0.9) * 1e6,
+        "p99_us": percentile(samples, 0.99) * 1e6,
+        "peak_bytes": peak,
+    }
+
+
+def run(patterns, duration, out=sys.stdout):
+    results = {}
+    for name, func in cases():
+        if patterns and not any(matches(name, pattern) for pattern in patterns):
+            continue
+        try:
+            result = measure(func, duration)
+        except (ImportError, OSError) as err:
+            # CairoSVG or the cairo library is not available.
+            print("%-28s skipped: %s" % (name, str(err).splitlines()[0]), file=out)
+            continue
+        results[name] = result
+        print("%-28s %10.1f ops/s  p50 %9.1f us  p90 %9.1f us  p99 %9.1f us  peak %8d B" % (
+            name, result["ops"], result["p50_us"], result["p90_us"], result["p99_us"], result["peak_bytes"]), file=out)
+    return results
+
+
+def compare(results, baseline, threshold, out=sys.stdout):
+    """
+    Prints the change of the median latency against a baseline and returns
+    the names of the benchmarks that are more than *threshold* percent
+    slower.
+    """
+    regressions = []
+    print(file=out)
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print("%-28s new" % name, file=out)
+            continue
+        change = (result["p50_us"] / previous["p50_us"] - 1) * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print("%-28s p50 %+7.1f %%  peak %+9d B%s" % (name, change, result["peak_bytes"] - previous["peak_bytes"], flag), file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("patterns", nargs="*", help="only run benchmarks with names starting with one of these, or containing one as a segment (e.g. svg/10, direct)")
+    parser.add_argument("--duration", type=float, default=0.5, help="minimum seconds per benchmark (default: 0.5)")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown reported as a regression (default: 10)")
+    args = parser.parse_args(argv)
+
+    results = run(args.patterns, args.duration)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
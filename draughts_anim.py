@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Animated game replays. Frames are given as an iterable of
+``(board, lastmove)`` pairs, like a :class:`pdraughts.GameReplay`, and are
+rendered with :func:`draughts_png.board_rgb()` and written to a file object
+one at a time. After the first frame, only the region that changed is
+stored.
+"""
+
+import pdraughts
+import draughts_png
+import collections
+import numbers
+import struct
+import zlib
+
+
+def _delays(delay, count, maximum):
+    """
+    Gets one delay in milliseconds per frame.
+    :raises: :exc:`ValueError` if a sequence does not have *count* delays
+        or a delay is not between 0 and *maximum*.
+    """
+    delays = [delay] * count if isinstance(delay, numbers.Real) else list(delay)
+    if len(delays) != count:
+        raise ValueError("{} delays for {} frames".format(len(delays), count))
+    for frame_delay in delays:
+        if not 0 <= frame_delay <= maximum:
+            raise ValueError("delay out of range: {}".format(frame_delay))
+    return delays
+
+
+def _frame_count(frames):
+    # The count of frames is needed up front, but boards are small compared
+    # to the rendered images.
+    if not hasattr(frames, "__len__"):
+        frames = list(frames)
+    if not frames:
+        raise ValueError("no frames")
+    return frames, len(frames)
+
+
+def _rows(board, lastmove, flipped, size):
+    _, _, rows = draughts_png.board_rgb(board, flipped=flipped, lastmove=lastmove, size=size)
+    return [bytes(row) for row in rows]
+
+
+def _common_prefix(a, b):
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _dirty_rect(previous, rows):
+    """
+    Gets the ``(x, y, width, height)`` in pixels of the region in which
+    *rows* differ from *previous*, or ``None`` if they are identical.
+    """
+    top = 0
+    while top < len(rows) and rows[top] == previous[top]:
+        top += 1
+    if top == len(rows):
+        return None
+    bottom = len(rows)
+    while rows[bottom - 1] == previous[bottom - 1]:
+        bottom -= 1
+
+    left, right = len(rows[0]), 0
+    for y in range(top, bottom):
+        if rows[y] != previous[y]:
+            left = min(left, _common_prefix(rows[y], previous[y]))
+            right = max(right, len(rows[y]) - _common_prefix(rows[y][::-1], previous[y][::-1]))
+    x = left // 3
+    return x, top, (right + 2) // 3 - x, bottom - top
+
+
+def _crop(rows, rect):
+    x, y, width, height = rect
+    return [row[x * 3:(x + width) * 3] for row in rows[y:y + height]]
+
+
+def _changes(frames, flipped, size):
+    """
+    Yields the board, the region and the rows of the whole first frame and
+    of the changed region of every following frame. A frame identical to its
+    predecessor yields a single unchanged pixel.
+    """
+    previous = None
+    for board, lastmove in frames:
+        rows = _rows(board, lastmove, flipped, size)
+        if previous is None:
+            yield board, (0, 0, len(rows[0]) // 3, len(rows)), rows
+        else:
+            rect = _dirty_rect(previous, rows) or (0, 0, 1, 1)
+            yield board, rect, _crop(rows, rect)
+        previous = rows
+
+
+def export_apng(fp, frames, *, delay=500, flipped=False, size=360, loop=0, compress_level=6):
+    """
+    Writes an animated PNG.
+    :param fp: A binary file object.
+    :param frames: ``(board, lastmove)`` pairs, e.g. a
+        :class:`pdraughts.GameReplay`.
+    :param delay: The display time of every frame in milliseconds, at most
+        65535, or a sequence with one delay per frame.
+    :param loop: How often to play the animation, ``0`` for forever.
+    :raises: :exc:`ValueError` if there are no frames or the delays do not
+        match them. Nothing is written then.
+    """
+    frames, count = _frame_count(frames)
+    delays = _delays(delay, count, 0xffff)
+    fp.write(draughts_png._PNG_SIGNATURE)
+    fp.write(draughts_png._chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)))
+    fp.write(draughts_png._chunk(b"acTL", struct.pack(">II", count, loop)))
+
+    sequence = 0
+    for index, ((_, rect, rows), frame_delay) in enumerate(zip(_changes(frames, flipped, size), delays)):
+        x, y, width, height = rect
+        fp.write(draughts_png._chunk(b"fcTL", struct.pack(">IIIIIHHBB", sequence, width, height, x, y, int(frame_delay), 1000, 0, 0)))
+        sequence += 1
+        data = zlib.compress(b"".join(b"\x00" + row for row in rows), compress_level)
+        if index == 0:
+            fp.write(draughts_png._chunk(b"IDAT", data))
+        else:
+            fp.write(draughts_png._chunk(b"fdAT", struct.pack(">I", sequence) + data))
+            sequence += 1
+
+    fp.write(draughts_png._chunk(b"IEND", b""))
+
+
+def export_sprite_sheet(fp, frames, *, flipped=False, size=360, compress_level=6):
+    """
+    Writes a PNG image with all frames stacked vertically, each *size*
+    pixels high. The image data is compressed while frames are rendered.
+    :raises: :exc:`ValueError` if there are no frames.
+    """
+    frames, count = _frame_count(frames)
+    fp.write(draughts_png._PNG_SIGNATURE)
+    fp.write(draughts_png._chunk(b"IHDR", struct.pack(">IIBBBBB", size, size * count, 8, 2, 0, 0, 0)))
+
+    compressor = zlib.compressobj(compress_level)
+    for board, lastmove in frames:
+        data = compressor.compress(b"".join(b"\x00" + row for row in _rows(board, lastmove, flipped, size)))
+        if data:
+            fp.write(draughts_png._chunk(b"IDAT", data))
+    fp.write(draughts_png._chunk(b"IDAT", compressor.flush()))
+    fp.write(draughts_png._chunk(b"IEND", b""))
+
+
+class _Palette:
+    """
+    A palette of the 256 most frequent colors of a sample board with every
+    kind of piece, lastmove highlights and arrows, as rendered for a given
+    board size and image size. Other colors map to the nearest entry.
+    """
+
+    def __init__(self, board_size, flipped, size):
+        fields = board_size ** 2 // 2
+        sample = pdraughts.ArrayBoard(None, board_size=board_size)
+        for square in range(1, fields + 1):
+            piece = pdraughts._CODE_PIECES[1 + square % (len(pdraughts._CODE_PIECES) - 1)]
+            sample.set_piece_at(square, piece)
+        lastmove = "".join("%02d" % square for square in range(1, min(fields, 99) + 1, 3))
+        arrows = [(1, fields), (board_size // 2, fields - board_size // 2 + 1), (fields // 2, fields // 2)]
+
+        _, _, rows = draughts_png.board_rgb(sample, flipped=flipped, lastmove=lastmove, arrows=arrows, size=size)
+        counts = collections.Counter(row[i:i + 3] for row in map(bytes, rows) for i in range(0, len(row), 3))
+        self.colors = [color for color, _ in counts.most_common(256)]
+        self.colors += [b"\x00\x00\x00"] * (256 - len(self.colors))
+        self._indices = {color: index for index, color in reversed(list(enumerate(self.colors)))}
+
+    def index(self, color):
+        try:
+            return self._indices[color]
+        except KeyError:
+            r, g, b = color
+            index = min(range(len(self.colors)), key=lambda i: (
+                (self.colors[i][0] - r) ** 2 + (self.colors[i][1] - g) ** 2 + (self.colors[i][2] - b) ** 2))
+            self._indices[color] = index
+            return index
+
+    def quantize(self, rows):
+        """Maps rows of RGB pixels to palette indices."""
+        get = self._indices.get
+        out = bytearray()
+        for row in rows:
+            for i in range(0, len(row), 3):
+                color = row[i:i + 3]
+                index = get(color)
+                out.append(self.index(color) if index is None else index)
+        return bytes(out)
+
+
+def _lzw(data, min_code_size=8):
+    """Compresses palette indices for a GIF image block."""
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    bits = 0
+    bit_count = 0
+
+    codes = {}
+    next_code = end + 1
+    code_size = min_code_size + 1
+
+    def emit(code):
+        nonlocal bits, bit_count
+        bits |= code << bit_count
+        bit_count += code_size
+        while bit_count >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            bit_count -= 8
+
+    emit(clear)
+    prefix = data[0]
+    for byte in data[1:]:
+        key = (prefix << 8) | byte
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        if next_code < 4096:
+            codes[key] = next_code
+            next_code += 1
+            if next_code > (1 << code_size) and code_size < 12:
+                code_size += 1
+        else:
+            emit(clear)
+            codes.clear()
+            next_code = end + 1
+            code_size = min_code_size + 1
+        prefix = byte
+    emit(prefix)
+    emit(end)
+    if bit_count:
+        out.append(bits & 0xff)
+    return bytes(out)
+
+
+def _sub_blocks(data):
+    return b"".join(bytes([len(data[i:i + 255])]) + data[i:i + 255] for i in range(0, len(data), 255)) + b"\x00"
+
+
+def export_gif(fp, frames, *, delay=500, flipped=False, size=360, loop=0):
+    """
+    Writes an animated GIF, with colors reduced to a palette of 256 entries.
+    :param fp: A binary file object.
+    :param frames: ``(board, lastmove)`` pairs, e.g. a
+        :class:`pdraughts.GameReplay`.
+    :param delay: The display time of every frame in milliseconds, or a
+        sequence with one delay per frame. GIF stores hundredths of a second,
+        at most 65535.
+    :param loop: How often to play the animation, ``0`` for forever.
+    :raises: :exc:`ValueError` if there are no frames or the delays do not
+        match them. Nothing is written then.
+    """
+    frames, count = _frame_count(frames)
+    delays = _delays(delay, count, 0xffff * 10 + 9)
+    palette = None
+    for (board, rect, rows), frame_delay in zip(_changes(frames, flipped, size), delays):
+        if palette is None:
+            palette = _Palette(board.board_size if board else 10, flipped, size)
+            fp.write(b"GIF89a" + struct.pack("<HHBBB", size, size, 0xf7, 0, 0) + b"".join(palette.colors))
+            fp.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+        x, y, width, height = rect
+        fp.write(b"!\xf9\x04\x04" + struct.pack("<H", int(frame_delay // 10)) + b"\x00\x00")
+        fp.write(b"," + struct.pack("<HHHHB", x, y, width, height, 0))
+        fp.write(b"\x08" + _sub_blocks(_lzw(palette.quantize(rows))))
+
+    fp.write(b";")
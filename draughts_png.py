@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import draughts_svg
+import instrumentation
+import pdraughts
+import itertools
+import math
+import multiprocessing
+import struct
+import threading
+import time
+import zlib
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_TILE_SVG = ('<svg xmlns="http://www.w3.org/2000/svg" version="1.1" xmlns:xlink="http://www.w3.org/1999/xlink" '
+             'viewBox="0 0 %d %d" width="%d" height="%d" preserveAspectRatio="none">'
+             '<defs>%s</defs><rect x="0" y="0" width="%d" height="%d" stroke="none" fill="%s" />'
+             '<use xlink:href="#%s-%s" transform="scale(%f, %f)" /></svg>')
+
+
+class QueueFull(Exception):
+    """Raised when a :class:`RasterPool` has no free slot for another job."""
+
+
+def svg2png(svg):
+    """
+    Converts an SVG image (``str`` or UTF-8 encoded ``bytes``) to PNG
+    using CairoSVG.
+    """
+    import cairosvg
+    if isinstance(svg, str):
+        svg = svg.encode("utf-8")
+    timed = instrumentation.enabled
+    if timed:
+        start = instrumentation.clock()
+    png = cairosvg.svg2png(bytestring=svg)
+    if timed:
+        instrumentation.lap("rasterize", start)
+    return png
+
+
+_started = None
+
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+
+def _run(token, svg):
+    # Runs in a worker: reports that the job started, so that its timeout
+    # does not include the time spent in the queue.
+    _started.put(token)
+    return svg2png(svg)
+
+
+class _Job:
+    __slots__ = ("pool", "callback", "error_callback", "started")
+
+    def __init__(self, pool, callback, error_callback):
+        self.pool = pool
+        self.callback = callback
+        self.error_callback = error_callback
+        self.started = None
+
+
+class RasterPool:
+    """
+    Converts SVG images to PNG in a pool of worker processes.
+    At most *max_queue* jobs are pending or running at a time, further
+    submissions raise :exc:`QueueFull` so that callers can shed load.
+    Workers are replaced after *max_jobs_per_worker* jobs to bound memory
+    growth.
+    :func:`rasterize()` waits at most *timeout* seconds from the moment a
+    worker starts the job, time spent in the queue is not counted. When a
+    job times out, the workers are terminated and replaced. All other jobs
+    of the old workers fail at once with
+    :exc:`multiprocessing.TimeoutError` and their slots are released.
+    """
+
+    def __init__(self, processes=None, *, max_queue=64, timeout=10.0, max_jobs_per_worker=1000):
+        self.processes = processes
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.pending = 0
+        self.recycled = 0
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._tokens = itertools.count()
+        self._pool, self._started = self._new_pool()
+
+    def _new_pool(self):
+        started = multiprocessing.SimpleQueue()
+        pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(started,),
+                                    maxtasksperchild=self.max_jobs_per_worker)
+        threading.Thread(target=self._listen, args=(started,), daemon=True).start()
+        return pool, started
+
+    def _listen(self, started):
+        for token in iter(started.get, None):
+            with self._lock:
+                job = self._jobs.get(token)
+                if job is not None:
+                    job.started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _release(self, token):
+        with self._lock:
+            job = self._jobs.pop(token, None)
+            if job is not None:
+                self.pending -= 1
+            return job
+
+    def _submit(self, svg, callback, error_callback):
+        token = next(self._tokens)
+
+        def done(result):
+            # Jobs of replaced workers have already failed.
+            job = self._release(token)
+            if job is not None and job.callback is not None:
+                job.callback(result)
+
+        def failed(error):
+            job = self._release(token)
+            if job is not None and job.error_callback is not None:
+                job.error_callback(error)
+
+        with self._lock:
+            if self.pending >= self.max_queue:
+                raise QueueFull("rasterization queue is full ({} jobs)".format(self.max_queue))
+            self.pending += 1
+            job = self._jobs[token] = _Job(self._pool, callback, error_callback)
+            try:
+                # Under the lock, so that the job cannot be submitted to a
+                # pool that is being replaced.
+                return token, job, self._pool.apply_async(_run, (token, svg), callback=done, error_callback=failed)
+            except BaseException:
+                del self._jobs[token]
+                self.pending -= 1
+                raise
+
+    def _recycle(self, token):
+        """Replaces the workers running a job that timed out."""
+        with self._lock:
+            job = self._jobs.get(token)
+            if job is None or job.pool is not self._pool:
+                # Finished in the meantime or already replaced.
+                return
+            pool, started = self._pool, self._started
+            self._pool, self._started = self._new_pool()
+            self.recycled += 1
+            stale = [(other, other_job) for other, other_job in self._jobs.items() if other_job.pool is pool]
+            for other, _ in stale:
+                del self._jobs[other]
+                self.pending -= 1
+
+        error = multiprocessing.TimeoutError("rasterization aborted, a job timed out")
+        for _, other_job in stale:
+            if other_job.error_callback is not None:
+                other_job.error_callback(error)
+        # Terminating waits for the worker handler threads, so do not block
+        # the caller.
+        threading.Thread(target=self._shutdown, args=(pool, started, True), daemon=True).start()
+
+    def _shutdown(self, pool, started, terminate):
+        if terminate:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+        started.put(None)
+
+    def submit(self, svg, callback=None, error_callback=None):
+        """
+        Queues the conversion of an SVG image and returns a
+        :class:`multiprocessing.pool.AsyncResult`. The callbacks are called
+        from a thread of the pool, like those of
+        :func:`multiprocessing.pool.Pool.apply_async()`. If the workers are
+        replaced, *error_callback* is called with a
+        :exc:`multiprocessing.TimeoutError` and the result never becomes
+        ready.
+        :raises: :exc:`QueueFull` if *max_queue* jobs are already pending.
+        """
+        _, _, result = self._submit(svg, callback, error_callback)
+        return result
+
+    def rasterize(self, svg, timeout=None):
+        """
+        Converts an SVG image to PNG in a worker process and waits for the
+        result.
+        :raises: :exc:`QueueFull` if *max_queue* jobs are already pending or
+            :exc:`multiprocessing.TimeoutError` if the job does not finish
+            in time or was aborted.
+        """
+        timed = instrumentation.enabled
+        if timed:
+            start = instrumentation.clock()
+        timeout = self.timeout if timeout is None else timeout
+
+        finished = threading.Event()
+        outcome = []
+
+        def done(result):
+            outcome.append((result, None))
+            finished.set()
+
+        def failed(error):
+            outcome.append((None, error))
+            finished.set()
+
+        token, job, _ = self._submit(svg, done, failed)
+        while True:
+            with self._lock:
+                started = job.started
+                if started is None:
+                    # Queued behind jobs that nobody waits for, e.g. from
+                    # submit(), which may be stuck.
+                    now = time.monotonic()
+                    overdue = next((other for other, other_job in self._jobs.items()
+                                    if other_job.pool is job.pool and other_job.started is not None
+                                    and now - other_job.started >= timeout), None)
+            if started is None:
+                if overdue is not None:
+                    self._recycle(overdue)
+                # Until the job starts, check again every *timeout* seconds.
+                wait = timeout
+            else:
+                wait = started + timeout - time.monotonic()
+                if wait <= 0:
+                    self._recycle(token)
+                    raise multiprocessing.TimeoutError("rasterization timed out")
+            if finished.wait(wait):
+                break
+
+        png, error = outcome[0]
+        if error is not None:
+            raise error
+        if timed:
+            instrumentation.lap("rasterize", start)
+        return png
+
+    def close(self):
+        """Stops accepting jobs and waits for the workers to exit."""
+        self._shutdown(self._pool, self._started, False)
+
+    def terminate(self):
+        """Stops the workers immediately, abandoning pending jobs."""
+        self._shutdown(self._pool, self._started, True)
+
+
+def _rgb(color):
+    return bytes.fromhex(color.lstrip("#") if len(color) == 7 else "".join(c * 2 for c in color.lstrip("#")))
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_png(width, height, rows, compress_level=6):
+    """
+    Encodes an image given as a list of *height* rows of packed 8-bit RGB
+    pixels as PNG.
+    """
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    data = zlib.compress(b"".join(b"\x00" + bytes(row) for row in rows), compress_level)
+    return _PNG_SIGNATURE + _chunk(b"IHDR", header) + _chunk(b"IDAT", data) + _chunk(b"IEND", b"")
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def decode_png(data):
+    """
+    Decodes an 8-bit non-interlaced RGB or RGBA PNG image, such as those
+    written by CairoSVG. Returns ``(width, height, rows)`` with rows of
+    packed RGB pixels, dropping the alpha channel.
+    :raises: :exc:`ValueError` if the image is invalid or unsupported.
+    """
+    if data[:8] != _PNG_SIGNATURE:
+        raise ValueError("not a png image")
+
+    header = None
+    idat = []
+    pos = 8
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += length + 12
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+
+    if header is None:
+        raise ValueError("png image without header")
+    width, height, depth, color_type, _, _, interlace = header
+    if depth != 8 or color_type not in (2, 6) or interlace:
+        raise ValueError("unsupported png format: depth {}, color type {}, interlace {}".format(depth, color_type, interlace))
+
+    bpp = 3 if color_type == 2 else 4
+    stride = width * bpp
+    raw = zlib.decompress(b"".join(idat))
+    prev = bytearray(stride)
+    rows = []
+    for y in range(height):
+        offset = y * (stride + 1)
+        kind = raw[offset]
+        line = bytearray(raw[offset + 1:offset + 1 + stride])
+        if kind == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 0xff
+        elif kind == 2:
+            for i in range(stride):
+                line[i] = (line[i] + prev[i]) & 0xff
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xff
+        elif kind == 4:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                upper_left = prev[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + _paeth(left, prev[i], upper_left)) & 0xff
+        elif kind != 0:
+            raise ValueError("invalid png filter type: {}".format(kind))
+        prev = line
+
+        if bpp == 4:
+            rgb = bytearray(width * 3)
+            rgb[0::3] = line[0::4]
+            rgb[1::3] = line[1::4]
+            rgb[2::3] = line[2::4]
+            rows.append(bytes(rgb))
+        else:
+            rows.append(bytes(line))
+
+    return width, height, rows
+
+
+_TILES = {}
+
+
+def _tile(piece, cls, width, height):
+    """
+    Gets the rows of a square of the given pixel size, with the piece
+    composited onto the square color.
+    """
+    key = (piece.symbol() if piece else None, cls, width, height)
+    try:
+        return _TILES[key]
+    except KeyError:
+        pass
+
+    fill = draughts_svg.DEFAULT_COLORS[cls]
+    if piece is None:
+        rows = [_rgb(fill) * width] * height
+    else:
+        size = draughts_svg.SQUARE_SIZE
+        svg = _TILE_SVG % (size, size, width, height, draughts_svg._PIECE_DEFS[piece.symbol()], size, size, fill,
+                           pdraughts.COLOR_NAMES[piece.color], pdraughts.PIECE_NAMES[piece.piece_type],
+                           size / 210, size / 210)
+        tile_width, tile_height, rows = decode_png(svg2png(svg))
+        if (tile_width, tile_height) != (width, height):
+            raise ValueError("unexpected tile size {}x{}, expected {}x{}".format(tile_width, tile_height, width, height))
+
+    _TILES[key] = rows
+    return rows
+
+
+def _blend_span(rows, y, x0, x1, color):
+    row = rows[y]
+    if not isinstance(row, bytearray):
+        row = rows[y] = bytearray(row)
+    for i in range(x0 * 3, x1 * 3, 3):
+        row[i] = (row[i] + color[0]) >> 1
+        row[i + 1] = (row[i + 1] + color[1]) >> 1
+        row[i + 2] = (row[i + 2] + color[2]) >> 1
+
+
+def _fill_polygon(rows, width, points, color):
+    # Half transparent scanline fill of the pixels with centers inside.
+    ys = [y for _, y in points]
+    edges = list(zip(points, points[1:] + points[:1]))
+    for y in range(max(0, int(math.floor(min(ys)))), min(len(rows), int(math.ceil(max(ys))))):
+        sample = y + 0.5
+        xs = sorted(x0 + (sample - y0) * (x1 - x0) / (y1 - y0)
+                    for (x0, y0), (x1, y1) in edges
+                    if y0 <= sample < y1 or y1 <= sample < y0)
+        for a, b in zip(xs[::2], xs[1::2]):
+            x0 = max(0, int(math.ceil(a - 0.5)))
+            x1 = min(width, int(math.ceil(b - 0.5)))
+            if x0 < x1:
+                _blend_span(rows, y, x0, x1, color)
+
+
+def _stroke_circle(rows, width, cx, cy, radius, stroke_width, color):
+    outer = radius + stroke_width / 2
+    inner = radius - stroke_width / 2
+    for y in range(max(0, int(math.floor(cy - outer))), min(len(rows), int(math.ceil(cy + outer)))):
+        dy = y + 0.5 - cy
+        if abs(dy) >= outer:
+            continue
+        half = math.sqrt(outer * outer - dy * dy)
+        spans = [(cx - half, cx + half)]
+        if abs(dy) < inner:
+            inner_half = math.sqrt(inner * inner - dy * dy)
+            spans = [(cx - half, cx - inner_half), (cx + inner_half, cx + half)]
+        for a, b in spans:
+            x0 = max(0, int(math.ceil(a - 0.5)))
+            x1 = min(width, int(math.ceil(b - 0.5)))
+            if x0 < x1:
+                _blend_span(rows, y, x0, x1, color)
+
+
+def board_rgb(board=None, *, flipped=False, lastmove=None, arrows=(), size=None):
+    """
+    Renders a board like :func:`draughts_svg.board()`, but directly to
+    pixels. Pieces are rasterized once per square size and background and
+    the image is composited from these tiles.
+    Returns ``(width, height, rows)`` with rows of packed RGB pixels.
+    """
+    timed = instrumentation.enabled
+    if timed:
+        start = instrumentation.clock()
+
+    board_size = board.board_size if board else 10
+    template = draughts_svg._board_template(board_size, bool(flipped))
+    if size is None:
+        size = board_size * draughts_svg.SQUARE_SIZE
+    edges = [i * size // board_size for i in range(board_size + 1)]
+
+    highlighted = set()
+    if lastmove:
+        highlighted = {int(lastmove[i:i+2]) for i in range(0, len(lastmove), 2)}
+    pieces = board.piece_map() if board is not None else {}
+
+    tile_count = len(_TILES)
+    tile_rows = []
+    for row, squares in enumerate(template.grid):
+        height = edges[row + 1] - edges[row]
+        tiles = []
+        for column, square_uci in enumerate(squares):
+            width = edges[column + 1] - edges[column]
+            if square_uci is None:
+                tiles.append(_tile(None, "square light", width, height))
+            else:
+                cls = "square dark lastmove" if square_uci in highlighted else "square dark"
+                tiles.append(_tile(pieces.get(square_uci), cls, width, height))
+        tile_rows.append((height, tiles))
+    if timed and len(_TILES) != tile_count:
+        # New tiles were rasterized, which svg2png() records by itself.
+        start = instrumentation.clock()
+
+    rows = []
+    for height, tiles in tile_rows:
+        for y in range(height):
+            rows.append(b"".join(tile[y] for tile in tiles))
+    if timed:
+        start = instrumentation.lap("composite", start)
+
+    scale = size / (board_size * draughts_svg.SQUARE_SIZE)
+    color = _rgb(draughts_svg.ARROW_COLOR)
+    for tail, head in arrows:
+        (x, y), shaft, marker = draughts_svg._arrow_shape(template, tail, head)
+        if shaft is None:
+            _stroke_circle(rows, size, x * scale, y * scale,
+                           draughts_svg.ARROW_CIRCLE_RADIUS * scale, draughts_svg.ARROW_CIRCLE_WIDTH * scale, color)
+            continue
+
+        dx, dy = shaft[0] - x, shaft[1] - y
+        length = math.hypot(dx, dy)
+        if length > 0:
+            nx = -dy / length * draughts_svg.ARROW_WIDTH / 2
+            ny = dx / length * draughts_svg.ARROW_WIDTH / 2
+            line = [(x + nx, y + ny), (shaft[0] + nx, shaft[1] + ny), (shaft[0] - nx, shaft[1] - ny), (x - nx, y - ny)]
+            _fill_polygon(rows, size, [(px * scale, py * scale) for px, py in line], color)
+        _fill_polygon(rows, size, [(px * scale, py * scale) for px, py in marker], color)
+    if timed:
+        instrumentation.lap("arrows", start)
+
+    return size, size, rows
+
+
+def board(board=None, *, flipped=False, lastmove=None, arrows=(), size=None, compress_level=6):
+    """
+    Renders a board with pieces and/or arrows as a PNG image, without
+    generating and parsing an SVG image for every call. Custom stylesheets
+    are not supported.
+    :param board: A :class:`pdraughts.BaseBoard` or ``None`` for a
+        draughtsboard without pieces.
+    :param flipped: Pass ``True`` to flip the board.
+    :param lastmove: An uci sequence to be highlighted.
+    :param arrows: A list of :class:`draughts_svg.Arrow` objects or tuples.
+    :param size: The size of the image in pixels or ``None`` for 45 pixels
+        per square.
+    :param compress_level: The zlib compression level.
+    """
+    width, height, rows = board_rgb(board, flipped=flipped, lastmove=lastmove, arrows=arrows, size=size)
+    timed = instrumentation.enabled
+    if timed:
+        start = instrumentation.clock()
+    png = encode_png(width, height, rows, compress_level)
+    if timed:
+        instrumentation.lap("encode", start)
+    return png
@@ -17,7 +17,9 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import pdraughts
+import instrumentation
 import collections
+import itertools
 import math
 
 import xml.etree.ElementTree as ET
@@ -43,6 +45,11 @@ DEFAULT_COLORS = {
     "square light lastmove": "#cdd16a",
 }
 
+ARROW_COLOR = "#888"
+ARROW_WIDTH = SQUARE_SIZE * 0.2
+ARROW_CIRCLE_RADIUS = SQUARE_SIZE * 0.9 / 2
+ARROW_CIRCLE_WIDTH = SQUARE_SIZE * 0.1
+
 
 class Arrow(collections.namedtuple("Arrow", "tail head")):
     """Details of an arrow to be drawn."""
@@ -91,7 +98,423 @@ def piece(piece, size=None):
     return SvgWrapper(ET.tostring(svg).decode("utf-8"))
 
 
-def board(board=None, *, flipped=False, lastmove=None, arrows=(), size=None, style=None):
+_RECT = '<rect x="%%d" y="%%d" width="%d" height="%d" class="%%s" stroke="none" fill="%%s" />' % (SQUARE_SIZE, SQUARE_SIZE)
+
+_USE = '<use xlink:href="#%s-%s" transform="%s" />'
+
+_PIECE_DEFS = {symbol: ET.tostring(ET.fromstring(definition)).decode("utf-8") for symbol, definition in PIECES.items()}
+
+
+class _BoardTemplate:
+    """
+    Pre-serialized static parts and geometry of a board for a given board
+    size and orientation. Only lastmove highlights, pieces and arrows are
+    spliced in at render time. Arrow shapes and fragments are memoized per
+    ``(tail, head)``.
+    """
+
+    __slots__ = ("board_size", "flipped", "header", "rects", "lastmove_rects", "transforms", "positions",
+                 "centers", "grid", "arrow_shapes", "arrow_fragments", "compact_arrow_fragments")
+
+    def __init__(self, board_size, flipped):
+        self.board_size = board_size
+        self.flipped = flipped
+        self.header = '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" xmlns:xlink="http://www.w3.org/1999/xlink" viewBox="0 0 %d %d"' % (board_size * SQUARE_SIZE, board_size * SQUARE_SIZE)
+
+        # Document order index and fragment for every square.
+        self.rects = []
+        self.lastmove_rects = {}
+        self.transforms = {}
+        self.positions = {}
+        self.centers = {}
+
+        # Square numbers of the dark squares, or None for light squares, in
+        # display order.
+        grid = [[None] * board_size for _ in range(board_size)]
+
+        for square in range(board_size ** 2):
+            x_index = square % board_size
+            y_index = square // board_size
+            x = (x_index if not flipped else board_size - 1 - x_index) * SQUARE_SIZE
+            y = (y_index if not flipped else board_size - 1 - y_index) * SQUARE_SIZE
+
+            if x_index % 2 == y_index % 2:
+                self.rects.append(_RECT % (x, y, "square light", DEFAULT_COLORS["square light"]))
+            else:
+                square_uci = square // 2 + 1
+                self.rects.append(_RECT % (x, y, "square dark", DEFAULT_COLORS["square dark"]))
+                self.lastmove_rects[square_uci] = (square, _RECT % (x, y, "square dark lastmove", DEFAULT_COLORS["square dark lastmove"]))
+                self.transforms[square_uci] = (square, "translate(%d, %d) scale(%f, %f)" % (x, y, SQUARE_SIZE / 210, SQUARE_SIZE / 210))
+                self.positions[square_uci] = (x, y)
+                self.centers[square_uci] = (x + SQUARE_SIZE / 2, y + SQUARE_SIZE / 2)
+                grid[y // SQUARE_SIZE][x // SQUARE_SIZE] = square_uci
+
+        self.grid = tuple(tuple(row) for row in grid)
+        self.arrow_shapes = {}
+        self.arrow_fragments = {}
+        self.compact_arrow_fragments = {}
+
+
+_BOARD_TEMPLATES = {}
+
+
+def _board_template(board_size, flipped):
+    try:
+        return _BOARD_TEMPLATES[(board_size, flipped)]
+    except KeyError:
+        template = _BOARD_TEMPLATES[(board_size, flipped)] = _BoardTemplate(board_size, flipped)
+        return template
+
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _head(template, size, style):
+    head = template.header
+    if size is not None:
+        head += ' width="%s" height="%s"' % (size, size)
+    head += ">"
+    if style:
+        head += "<style>%s</style>" % _escape(style)
+    return head
+
+
+_DEFS = {}
+
+
+def _defs(board):
+    if not board:
+        return "<defs />"
+
+    kinds = tuple((piece_type, color)
+                  for color in pdraughts.COLORS
+                  for piece_type in pdraughts.PIECE_TYPES
+                  if board.contains_piece(piece_type, color))
+    try:
+        return _DEFS[kinds]
+    except KeyError:
+        defs = "".join(_PIECE_DEFS[pdraughts.Piece(piece_type, color).symbol()] for piece_type, color in kinds)
+        defs = _DEFS[kinds] = "<defs>%s</defs>" % defs if defs else "<defs />"
+        return defs
+
+
+def _highlighted(template, lastmove):
+    if not lastmove:
+        return frozenset()
+    return frozenset(square_uci for square_uci in (int(lastmove[i:i+2]) for i in range(0, len(lastmove), 2))
+                     if square_uci in template.transforms)
+
+
+def _piece_map(template, board):
+    if board is None:
+        return {}
+    return {square_uci: piece for square_uci, piece in board.piece_map().items() if square_uci in template.transforms}
+
+
+def _square(template, square_uci, highlighted, piece):
+    index, transform = template.transforms[square_uci]
+    rect = template.lastmove_rects[square_uci][1] if square_uci in highlighted else template.rects[index]
+    if piece:
+        rect += _USE % (pdraughts.COLOR_NAMES[piece.color], pdraughts.PIECE_NAMES[piece.piece_type], transform)
+    return index, rect
+
+
+def _arrow_shape(template, tail, head):
+    """
+    Computes the geometry of an arrow in viewBox coordinates. Returns
+    ``(center, None, None)`` for a circle around the head square, otherwise
+    ``(tail, shaft, marker)`` where *marker* is the triangle of the arrow head.
+    :raises: :exc:`ValueError` if a square is not on the board.
+    """
+    try:
+        return template.arrow_shapes[(tail, head)]
+    except KeyError:
+        pass
+
+    try:
+        xtail, ytail = template.centers[tail]
+        xhead, yhead = template.centers[head]
+    except (KeyError, TypeError):
+        raise ValueError("arrow {}-{} out of range for board_size {}".format(tail, head, template.board_size))
+
+    shape = template.arrow_shapes[(tail, head)] = _compute_arrow_shape(xtail, ytail, xhead, yhead)
+    return shape
+
+
+def _compute_arrow_shape(xtail, ytail, xhead, yhead):
+    if (xhead, yhead) == (xtail, ytail):
+        return (xhead, yhead), None, None
+
+    marker_size = 0.75 * SQUARE_SIZE
+    marker_margin = 0.1 * SQUARE_SIZE
+
+    dx, dy = xhead - xtail, yhead - ytail
+    hypot = math.hypot(dx, dy)
+
+    shaft_x = xhead - dx * (marker_size + marker_margin) / hypot
+    shaft_y = yhead - dy * (marker_size + marker_margin) / hypot
+
+    xtip = xhead - dx * marker_margin / hypot
+    ytip = yhead - dy * marker_margin / hypot
+
+    marker = [(xtip, ytip),
+              (shaft_x + dy * 0.5 * marker_size / hypot,
+               shaft_y - dx * 0.5 * marker_size / hypot),
+              (shaft_x - dy * 0.5 * marker_size / hypot,
+               shaft_y + dx * 0.5 * marker_size / hypot)]
+
+    return (xtail, ytail), (shaft_x, shaft_y), marker
+
+
+def validate_arrows(board_size, arrows):
+    """
+    Checks that all arrows, given as ``(tail, head)`` pairs, are on a board
+    of the given size, without rendering anything.
+    :raises: :exc:`ValueError` if an arrow square is not on the board.
+    """
+    fields = board_size ** 2 // 2
+    for tail, head in arrows:
+        if not (1 <= tail <= fields and 1 <= head <= fields):
+            raise ValueError("arrow {}-{} out of range for board_size {}".format(tail, head, board_size))
+
+
+def _arrows(template, arrows):
+    svg = []
+    fragments = template.arrow_fragments
+
+    for tail, head in arrows:
+        try:
+            svg.append(fragments[(tail, head)])
+            continue
+        except KeyError:
+            pass
+
+        (x, y), shaft, marker = _arrow_shape(template, tail, head)
+
+        if shaft is None:
+            fragment = '<circle cx="%s" cy="%s" r="%s" stroke-width="%s" stroke="%s" fill="none" opacity="0.5" />' % (
+                x, y, ARROW_CIRCLE_RADIUS, ARROW_CIRCLE_WIDTH, ARROW_COLOR)
+        else:
+            fragment = '<line x1="%s" y1="%s" x2="%s" y2="%s" stroke="%s" stroke-width="%s" opacity="0.5" stroke-linecap="butt" class="arrow" />' % (
+                x, y, shaft[0], shaft[1], ARROW_COLOR, ARROW_WIDTH)
+            fragment += '<polygon points="%s" fill="%s" opacity="0.5" class="arrow" />' % (
+                " ".join(str(x) + "," + str(y) for x, y in marker), ARROW_COLOR)
+
+        fragments[(tail, head)] = fragment
+        svg.append(fragment)
+
+    return svg
+
+
+def _compact_piece_def(definition):
+    # Scale the piece group itself, so that it can be placed with the x and
+    # y attributes of <use>.
+    g = ET.fromstring(definition)
+    del g.attrib["viewBox"]
+    g.set("transform", "scale(%s)" % _number(SQUARE_SIZE / 210, 6))
+    return ET.tostring(g).decode("utf-8")
+
+
+def _number(value, digits=1):
+    text = "%.*f" % (digits, value)
+    text = text.rstrip("0").rstrip(".") if "." in text else text
+    return "0" if text == "-0" else text
+
+
+_COMPACT_PIECE_DEFS = {symbol: _compact_piece_def(definition) for symbol, definition in PIECES.items()}
+
+
+def _compact_arrows(template, arrows):
+    svg = []
+    fragments = template.compact_arrow_fragments
+
+    for tail, head in arrows:
+        try:
+            svg.append(fragments[(tail, head)])
+            continue
+        except KeyError:
+            pass
+
+        (x, y), shaft, marker = _arrow_shape(template, tail, head)
+
+        if shaft is None:
+            fragment = '<circle cx="%s" cy="%s" r="%s" stroke-width="%s" stroke="%s" fill="none" opacity=".5"/>' % (
+                _number(x), _number(y), _number(ARROW_CIRCLE_RADIUS), _number(ARROW_CIRCLE_WIDTH), ARROW_COLOR)
+        else:
+            fragment = '<line x1="%s" y1="%s" x2="%s" y2="%s" stroke="%s" stroke-width="%s" opacity=".5" class="arrow"/>' % (
+                _number(x), _number(y), _number(shaft[0]), _number(shaft[1]), ARROW_COLOR, _number(ARROW_WIDTH))
+            fragment += '<polygon points="%s" fill="%s" opacity=".5" class="arrow"/>' % (
+                " ".join(_number(x) + "," + _number(y) for x, y in marker), ARROW_COLOR)
+
+        fragments[(tail, head)] = fragment
+        svg.append(fragment)
+
+    return svg
+
+
+def _squares_path(template, squares):
+    return "".join("M%d %dh%dv%dh-%dz" % (template.positions[square_uci] + (SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+                   for square_uci in squares)
+
+
+def _compact_board(board, flipped, lastmove, arrows, size, style, sprite):
+    board_size = board.board_size if board else 10
+    template = _board_template(board_size, bool(flipped))
+    pieces = _piece_map(template, board)
+    highlighted = _highlighted(template, lastmove)
+    width = board_size * SQUARE_SIZE
+
+    svg = [_head(template, size, style).replace(' version="1.1"', "", 1)]
+
+    if pieces and not sprite:
+        symbols = sorted(set(piece.symbol() for piece in pieces.values()))
+        svg.append("<defs>%s</defs>" % "".join(_COMPACT_PIECE_DEFS[symbol] for symbol in symbols))
+
+    # Light squares are the background, dark squares a single path.
+    svg.append('<rect width="%d" height="%d" class="square light" fill="%s"/>' % (width, width, DEFAULT_COLORS["square light"]))
+    svg.append('<path class="square dark" fill="%s" d="%s"/>' % (
+        DEFAULT_COLORS["square dark"], _squares_path(template, sorted(set(template.positions) - highlighted))))
+    if highlighted:
+        svg.append('<path class="square dark lastmove" fill="%s" d="%s"/>' % (
+            DEFAULT_COLORS["square dark lastmove"], _squares_path(template, sorted(highlighted))))
+
+    for square_uci, piece in sorted(pieces.items()):
+        x, y = template.positions[square_uci]
+        svg.append('<use xlink:href="%s#%s-%s" x="%d" y="%d"/>' % (
+            sprite or "", pdraughts.COLOR_NAMES[piece.color], pdraughts.PIECE_NAMES[piece.piece_type], x, y))
+
+    svg.extend(_compact_arrows(template, arrows))
+    svg.append("</svg>")
+    return SvgWrapper("".join(svg))
+
+
+def sprite():
+    """
+    Renders an SVG document with the definitions of all pieces, to be
+    served at the URL passed as *sprite* to :func:`board()`.
+    """
+    return SvgWrapper('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"><defs>%s</defs></svg>' % (
+        "".join(_COMPACT_PIECE_DEFS[symbol] for symbol in PIECES)))
+
+
+class Frame:
+    """
+    A rendered board in an intermediate form, that can be updated to a new
+    position with :func:`update_frame()`.
+    """
+
+    __slots__ = ("template", "head", "defs", "squares", "pieces", "highlighted", "arrows")
+
+    def __init__(self, template, head, defs, squares, pieces, highlighted, arrows):
+        self.template = template
+        self.head = head
+        self.defs = defs
+        self.squares = squares
+        self.pieces = pieces
+        self.highlighted = highlighted
+        self.arrows = arrows
+
+    def svg(self):
+        """Gets the SVG image of the frame."""
+        timed = instrumentation.enabled
+        if timed:
+            start = instrumentation.clock()
+        svg = SvgWrapper(self.head + self.defs + "".join(self.squares) + "".join(self.arrows) + "</svg>")
+        if timed:
+            instrumentation.lap("serialize", start)
+        return svg
+
+
+def frame(board=None, *, flipped=False, lastmove=None, arrows=(), size=None, style=None):
+    """
+    Renders a board like :func:`board()`, but returns a :class:`Frame`
+    that can be passed to :func:`update_frame()`.
+    """
+    board_size = board.board_size if board else 10
+    template = _board_template(board_size, bool(flipped))
+    return _frame(template, _head(template, size, style), board, lastmove, arrows)
+
+
+def _frame(template, head, board, lastmove, arrows):
+    timed = instrumentation.enabled
+    if timed:
+        start = instrumentation.clock()
+
+    defs = _defs(board)
+    if timed:
+        start = instrumentation.lap("defs", start)
+
+    highlighted = _highlighted(template, lastmove)
+    squares = list(template.rects)
+    for square_uci in highlighted:
+        index, rect = template.lastmove_rects[square_uci]
+        squares[index] = rect
+    if timed:
+        start = instrumentation.lap("squares", start)
+
+    pieces = _piece_map(template, board)
+    for square_uci, piece in pieces.items():
+        index, rect = _square(template, square_uci, highlighted, piece)
+        squares[index] = rect
+    if timed:
+        start = instrumentation.lap("pieces", start)
+
+    arrows = _arrows(template, arrows)
+    if timed:
+        instrumentation.lap("arrows", start)
+
+    return Frame(template, head, defs, squares, pieces, highlighted, arrows)
+
+
+def update_frame(frame, board, *, lastmove=None, arrows=()):
+    """
+    Renders a new position on a previously rendered :class:`Frame`, with
+    the same orientation, size and style. Only the squares whose piece or
+    lastmove highlight changed are rendered again, the previous frame is
+    left untouched.
+    :raises: :exc:`ValueError` if the board size does not match.
+    """
+    template = frame.template
+    board_size = board.board_size if board else 10
+    if board_size != template.board_size:
+        raise ValueError("board_size {} does not match frame with board_size {}".format(board_size, template.board_size))
+
+    timed = instrumentation.enabled
+    if timed:
+        start = instrumentation.clock()
+
+    pieces = _piece_map(template, board)
+    highlighted = _highlighted(template, lastmove)
+
+    changed = set(highlighted.symmetric_difference(frame.highlighted))
+    old_pieces = frame.pieces
+    for square_uci, piece in pieces.items():
+        if old_pieces.get(square_uci) != piece:
+            changed.add(square_uci)
+    for square_uci in old_pieces:
+        if square_uci not in pieces:
+            changed.add(square_uci)
+
+    squares = list(frame.squares)
+    for square_uci in changed:
+        index, rect = _square(template, square_uci, highlighted, pieces.get(square_uci))
+        squares[index] = rect
+    if timed:
+        start = instrumentation.lap("diff", start)
+
+    defs = _defs(board)
+    if timed:
+        start = instrumentation.lap("defs", start)
+
+    arrows = _arrows(template, arrows)
+    if timed:
+        instrumentation.lap("arrows", start)
+
+    return Frame(template, frame.head, defs, squares, pieces, highlighted, arrows)
+
+
+def board(board=None, *, flipped=False, lastmove=None, arrows=(), size=None, style=None, compact=False, sprite=None):
     """
     Renders a board with pieces and/or arrows as an SVG image.
     :param board: A :class:`pdraughts.BaseBoard` for a draughtsboard with pieces or
@@ -103,119 +526,79 @@ def board(board=None, *, flipped=False, lastmove=None, arrows=(), size=None, sty
     :param size: The size of the image in pixels (e.g., ``400`` for a 400 by
         400 board) or ``None`` (the default) for no size limit.
     :param style: A CSS stylesheet to include in the SVG image.
+    :param compact: Pass ``True`` for a smaller document: light squares are
+        the background, dark and highlighted squares are one path each,
+        pieces are placed with ``x`` and ``y`` and coordinates are rounded.
+    :param sprite: With *compact*, the URL of the document rendered by
+        :func:`sprite()`. Pieces then reference its definitions instead of
+        including them. Note that many viewers do not load external
+        references, e.g. browsers for images in ``<img>`` elements.
+    :raises: :exc:`ValueError` if an arrow square is not on the board.
     """
-    board_size = board.board_size if board else 10
-    margin = 0
-    svg = _svg(board_size * SQUARE_SIZE + 2 * margin, size)
+    if compact:
+        return _compact_board(board, flipped, lastmove, arrows, size, style, sprite)
+    return frame(board, flipped=flipped, lastmove=lastmove, arrows=arrows, size=size, style=style).svg()
 
-    if style:
-        ET.SubElement(svg, "style").text = style
-
-    if lastmove:
-        uciparts = [int(lastmove[i:i+2]) for i in range(0, len(lastmove), 2)]
-
-    defs = ET.SubElement(svg, "defs")
-    if board:
-        for color in pdraughts.COLORS:
-            for piece_type in pdraughts.PIECE_TYPES:
-                if board.contains_piece(piece_type, color):
-                    defs.append(ET.fromstring(PIECES[pdraughts.Piece(piece_type, color).symbol()]))
-
-    for square in range(board_size ** 2):
-
-        x_index = square % board_size
-        y_index = int((square + (board_size - x_index)) / board_size - 1)
-        x = (x_index if not flipped else board_size - 1 - x_index) * SQUARE_SIZE + margin
-        y = (y_index if not flipped else board_size - 1 - y_index) * SQUARE_SIZE + margin
-
-        square_uci = int(square / 2) + 1 if x_index % 2 != y_index % 2 else -1
-
-        cls = ["square", "light" if x_index % 2 == y_index % 2 else "dark"]
-        if lastmove and square_uci != -1 and square_uci in uciparts:
-            cls.append("lastmove")
-        fill_color = DEFAULT_COLORS[" ".join(cls)]
-
-        ET.SubElement(svg, "rect", {
-            "x": str(x),
-            "y": str(y),
-            "width": str(SQUARE_SIZE),
-            "height": str(SQUARE_SIZE),
-            "class": " ".join(cls),
-            "stroke": "none",
-            "fill": fill_color,
-        })
-
-        # Render pieces.
-        if square_uci != -1 and board is not None:
-            piece = board.piece_at(square_uci)
-            if piece:
-                ET.SubElement(svg, "use", {
-                    "xlink:href": "#%s-%s" % (pdraughts.COLOR_NAMES[piece.color], pdraughts.PIECE_NAMES[piece.piece_type]),
-                    "transform": "translate(%d, %d) scale(%f, %f)" % (x, y, SQUARE_SIZE / 210, SQUARE_SIZE / 210),
-                })
 
-    for tail, head in arrows:
+def render_game(board, moves, *, flipped=False, size=None, style=None, board_size=10):
+    """
+    Renders every position of a game as SVG images, one at a time, with
+    the move leading to each position highlighted.
+    :param board: The start position as a :class:`pdraughts.BaseBoard` or a
+        FEN string.
+    :param moves: A list of moves in uci notation, see
+        :func:`pdraughts.BaseBoard.push_uci()`.
+    :raises: :exc:`ValueError` if one of the moves is invalid.
+    """
+    if isinstance(board, str):
+        board = pdraughts.ArrayBoard(board, board_size=board_size)
+    positions, lastmoves = itertools.tee(pdraughts.GameReplay(board, moves))
+    return board_many((position for position, _ in positions), lastmoves=(lastmove for _, lastmove in lastmoves),
+                      flipped=flipped, size=size, style=style)
 
-        tail_conv = tail * 2 - 1
-        tail_y = (tail_conv + (board_size - tail_conv % board_size)) / board_size - 1
-        tail_x = tail_conv % board_size - tail_y % 2
-
-        head_conv = head * 2 - 1
-        head_y = (head_conv + (board_size - head_conv % board_size)) / board_size - 1
-        head_x = head_conv % board_size - head_y % 2
-
-        xtail = margin + (tail_x + 0.5 if not flipped else board_size - 0.5 - tail_x) * SQUARE_SIZE
-        ytail = margin + (board_size - 0.5 - tail_y if flipped else tail_y + 0.5) * SQUARE_SIZE
-
-        xhead = margin + (head_x + 0.5 if not flipped else board_size - 0.5 - head_x) * SQUARE_SIZE
-        yhead = margin + (board_size - 0.5 - head_y if flipped else head_y + 0.5) * SQUARE_SIZE
-
-        if (head_x, head_y) == (tail_x, tail_y):
-            ET.SubElement(svg, "circle", {
-                "cx": str(xhead),
-                "cy": str(yhead),
-                "r": str(SQUARE_SIZE * 0.9 / 2),
-                "stroke-width": str(SQUARE_SIZE * 0.1),
-                "stroke": "#888",
-                "fill": "none",
-                "opacity": "0.5",
-            })
-        else:
-            marker_size = 0.75 * SQUARE_SIZE
-            marker_margin = 0.1 * SQUARE_SIZE
-
-            dx, dy = xhead - xtail, yhead - ytail
-            hypot = math.hypot(dx, dy)
-
-            shaft_x = xhead - dx * (marker_size + marker_margin) / hypot
-            shaft_y = yhead - dy * (marker_size + marker_margin) / hypot
-
-            xtip = xhead - dx * marker_margin / hypot
-            ytip = yhead - dy * marker_margin / hypot
-
-            ET.SubElement(svg, "line", {
-                "x1": str(xtail),
-                "y1": str(ytail),
-                "x2": str(shaft_x),
-                "y2": str(shaft_y),
-                "stroke": "#888",
-                "stroke-width": str(SQUARE_SIZE * 0.2),
-                "opacity": "0.5",
-                "stroke-linecap": "butt",
-                "class": "arrow",
-            })
-
-            marker = [(xtip, ytip),
-                      (shaft_x + dy * 0.5 * marker_size / hypot,
-                       shaft_y - dx * 0.5 * marker_size / hypot),
-                      (shaft_x - dy * 0.5 * marker_size / hypot,
-                       shaft_y + dx * 0.5 * marker_size / hypot)]
-
-            ET.SubElement(svg, "polygon", {
-                "points": " ".join(str(x) + "," + str(y) for x, y in marker),
-                "fill": "#888",
-                "opacity": "0.5",
-                "class": "arrow",
-            })
 
-    return SvgWrapper(ET.tostring(svg).decode("utf-8"))
+_MISSING = object()
+
+
+def board_many(boards, *, flipped=False, lastmoves=None, arrows=None, size=None, style=None, board_size=10):
+    """
+    Renders a sequence of boards, e.g. every position of a game, as SVG
+    images. The images are generated one at a time and are identical to
+    those of :func:`board()`. Each image is rendered as an update of the
+    previous one, see :func:`update_frame()`.
+    :param boards: An iterable of :class:`pdraughts.BaseBoard` objects or
+        FEN strings.
+    :param flipped: Pass ``True`` to flip the boards.
+    :param lastmoves: An iterable with an uci sequence (or ``None``) to be
+        highlighted for each board.
+    :param arrows: An iterable with a list of arrows for each board.
+    :param size: The size of the images in pixels or ``None``.
+    :param style: A CSS stylesheet to include in the SVG images.
+    :param board_size: The board size used to parse FEN strings.
+    :raises: :exc:`ValueError` if *lastmoves* or *arrows* do not have one
+        entry per board.
+    """
+    columns = [iter(boards)]
+    columns.append(itertools.repeat(None) if lastmoves is None else iter(lastmoves))
+    columns.append(itertools.repeat(()) if arrows is None else iter(arrows))
+    previous = None
+
+    for board, lastmove, frame_arrows in itertools.zip_longest(*columns, fillvalue=_MISSING):
+        if board is _MISSING:
+            # The default columns are endless, but given ones must end
+            # with the boards.
+            if (lastmoves is not None and lastmove is not _MISSING) or (arrows is not None and frame_arrows is not _MISSING):
+                raise ValueError("more lastmoves or arrows than boards")
+            break
+        if lastmove is _MISSING or frame_arrows is _MISSING:
+            raise ValueError("fewer lastmoves or arrows than boards")
+
+        if isinstance(board, str):
+            board = pdraughts.ArrayBoard(board, board_size=board_size)
+
+        frame_size = board.board_size if board else 10
+        if previous is not None and previous.template.board_size == frame_size:
+            previous = update_frame(previous, board, lastmove=lastmove, arrows=frame_arrows or ())
+        else:
+            previous = frame(board, flipped=flipped, lastmove=lastmove, arrows=frame_arrows or (), size=size, style=style)
+        yield previous.svg()
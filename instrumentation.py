@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Opt-in timing of the rendering stages.
+
+The instrumented code checks :data:`enabled` before reading the clock, so
+there is next to no overhead while no sink is registered. Stages are
+``parse`` (FEN parsing), ``defs``, ``squares``, ``pieces``, ``arrows``,
+``diff`` (:func:`draughts_svg.update_frame()`), ``serialize``,
+``rasterize`` (CairoSVG), ``composite`` (assembling the image from cached
+tiles in the direct renderer, excluding rasterizing new tiles) and
+``encode`` (PNG encoding of the direct renderer).
+"""
+
+import bisect
+import threading
+import time
+
+
+enabled = False
+
+_sinks = []
+
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                   0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def add_sink(sink):
+    """
+    Registers a callable ``sink(stage, seconds)`` that is called for every
+    timed stage and enables instrumentation.
+    """
+    global enabled
+    _sinks.append(sink)
+    enabled = True
+
+
+def remove_sink(sink):
+    """Unregisters a sink, disabling instrumentation if it was the last."""
+    global enabled
+    _sinks.remove(sink)
+    enabled = bool(_sinks)
+
+
+def record(stage, seconds):
+    """Reports the duration of a stage to all sinks."""
+    for sink in _sinks:
+        sink(stage, seconds)
+
+
+clock = time.perf_counter
+
+
+def lap(stage, start):
+    """Records the time since *start* for a stage and returns the current time."""
+    now = clock()
+    record(stage, now - start)
+    return now
+
+
+class Histogram:
+    """A cumulative histogram of durations in seconds."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+class Registry:
+    """
+    A sink that keeps a :class:`Histogram` per stage and can be dumped in
+    the Prometheus text format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, name="boardimage_stage_seconds"):
+        self.buckets = buckets
+        self.name = name
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, seconds):
+        with self._lock:
+            try:
+                histogram = self.histograms[stage]
+            except KeyError:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def prometheus(self):
+        """Gets all histograms in the Prometheus text exposition format."""
+        lines = [
+            "# HELP %s Time spent in rendering stages." % self.name,
+            "# TYPE %s histogram" % self.name,
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append('%s_bucket{stage="%s",le="%s"} %d' % (self.name, stage, _format_bound(bound), cumulative))
+                lines.append('%s_bucket{stage="%s",le="+Inf"} %d' % (self.name, stage, histogram.count))
+                lines.append('%s_sum{stage="%s"} %r' % (self.name, stage, histogram.sum))
+                lines.append('%s_count{stage="%s"} %d' % (self.name, stage, histogram.count))
+        return "\n".join(lines) + "\n"
+
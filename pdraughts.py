@@ -20,6 +20,10 @@
 # <https://en.wikipedia.org/wiki/User:Cburnett> and also licensed under the
 # GNU General Public License.
 
+import instrumentation
+import types
+
+
 COLORS = [WHITE, BLACK] = [True, False]
 COLOR_NAMES = ["black", "white"]
 
@@ -32,6 +36,8 @@ STARTING_BOARD_FEN = "W:W31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,4
 class Piece:
     """A piece with type and color."""
 
+    __slots__ = ("piece_type", "color")
+
     def __init__(self, piece_type, color):
         self.piece_type = piece_type
         self.color = color
@@ -86,6 +92,32 @@ class Piece:
             return cls(PIECE_SYMBOLS.index(symbol.lower()), WHITE)
 
 
+# Shared piece instances indexed by the piece codes of :class:`ArrayBoard`.
+# Code 0 is an empty square, white pieces are 1 to 4 and black pieces 5 to 8.
+_CODE_PIECES = [None] + [Piece(piece_type, color) for color in COLORS for piece_type in PIECE_TYPES]
+
+_FEN_PIECE_TYPES = {"K": KING, "k": KING, "G": GHOSTMAN, "g": GHOSTMAN, "P": GHOSTKING, "p": GHOSTKING}
+
+
+def _piece_code(piece_type, color):
+    return piece_type if color == WHITE else piece_type + len(PIECE_TYPES)
+
+
+def _square_coords(square, board_size):
+    # Row and column of a square, counted from the top left corner.
+    row, index = divmod(square - 1, board_size // 2)
+    return row, 2 * index + (1 if row % 2 == 0 else 0)
+
+
+def _parse_uci(uci):
+    if len(uci) < 4 or len(uci) % 2 != 0:
+        raise ValueError("invalid uci: {}".format(uci))
+    try:
+        return [int(uci[i:i+2]) for i in range(0, len(uci), 2)]
+    except ValueError:
+        raise ValueError("invalid uci: {}".format(uci))
+
+
 class BaseBoard:
     """
     A board representing the position of draughts pieces.
@@ -105,7 +137,7 @@ class BaseBoard:
         elif board_fen == STARTING_BOARD_FEN:
             self._reset_board()
         else:
-            self._set_board_fen(board_fen)
+            self.set_board_fen(board_fen)
 
     def _reset_board(self):
         self.pieces = {}
@@ -136,6 +168,73 @@ class BaseBoard:
         """Gets the :class:`piece <draughts.Piece>` at the given square."""
         return self.pieces.get(square)
 
+    def piece_map(self):
+        """Gets a dictionary of :class:`pieces <draughts.Piece>` by square number."""
+        return dict(self.pieces)
+
+    def set_piece_at(self, square, piece):
+        """Puts a piece on a square, replacing any piece that was there."""
+        self.pieces[square] = piece
+
+    def remove_piece_at(self, square):
+        """Removes the piece from the given square and returns it, if any."""
+        return self.pieces.pop(square, None)
+
+    def copy(self):
+        """Creates a copy of the board."""
+        board = type(self)(None, board_size=self.board_size)
+        board.pieces = dict(self.pieces)
+        return board
+
+    def push_uci(self, uci):
+        """
+        Applies a move given as a sequence of two digit squares, like the
+        *lastmove* of :func:`draughts_svg.board()`: ``0510`` for a move from
+        5 to 10 or ``23141932`` for a capture visiting 14 and 19 before
+        landing on 32. Opposing pieces between consecutive squares are
+        captured and a man reaching the last row is promoted to a king.
+        Returns the list of captured squares.
+        :raises: :exc:`ValueError` if the move is invalid.
+        """
+        squares = _parse_uci(uci)
+        fields = self.board_size ** 2 // 2
+        for square in squares:
+            if not 0 < square <= fields:
+                raise ValueError("square {} out of range for board_size {}: {}".format(square, self.board_size, uci))
+
+        piece = self.piece_at(squares[0])
+        if piece is None:
+            raise ValueError("no piece on square {}: {}".format(squares[0], uci))
+        if squares[-1] != squares[0] and self.piece_at(squares[-1]) is not None:
+            raise ValueError("square {} is occupied: {}".format(squares[-1], uci))
+
+        captured = []
+        half = self.board_size // 2
+        for from_square, to_square in zip(squares, squares[1:]):
+            from_row, from_column = _square_coords(from_square, self.board_size)
+            to_row, to_column = _square_coords(to_square, self.board_size)
+            distance = abs(to_row - from_row)
+            if distance == 0 or distance != abs(to_column - from_column):
+                raise ValueError("squares {} and {} are not on a diagonal: {}".format(from_square, to_square, uci))
+
+            row_step = 1 if to_row > from_row else -1
+            column_step = 1 if to_column > from_column else -1
+            for step in range(1, distance):
+                square = (from_row + row_step * step) * half + (from_column + column_step * step) // 2 + 1
+                other = self.piece_at(square)
+                if other is not None and other.color != piece.color:
+                    captured.append(square)
+
+        for square in captured:
+            self.remove_piece_at(square)
+        self.remove_piece_at(squares[0])
+
+        to_row, _ = _square_coords(squares[-1], self.board_size)
+        if piece.piece_type == MAN and to_row == (0 if piece.color == WHITE else self.board_size - 1):
+            piece = Piece(KING, piece.color)
+        self.set_piece_at(squares[-1], piece)
+        return captured
+
     def _set_board_fen(self, fen):
         # Compability with set_fen().
         fen = fen.strip()
@@ -156,9 +255,187 @@ class BaseBoard:
                 elif len(part_piece) > 0:
                     self.pieces[int(part_piece)] = Piece(MAN, part_color)
 
+    def board_fen(self):
+        """
+        Gets the board part of the FEN, with the pieces of each color
+        listed in ascending square order.
+        """
+        parts = {WHITE: [], BLACK: []}
+        pieces = self.piece_map()
+        for square in sorted(pieces):
+            piece = pieces[square]
+            prefix = "" if piece.piece_type == MAN else PIECE_SYMBOLS[piece.piece_type].upper()
+            parts[piece.color].append(prefix + str(square))
+        return "W" + ",".join(parts[WHITE]) + ":B" + ",".join(parts[BLACK])
+
     def set_board_fen(self, fen):
         """
         Parses a FEN and sets the board from it.
         :raises: :exc:`ValueError` if the FEN string is invalid.
         """
-        self._set_board_fen(fen)
\ No newline at end of file
+        timed = instrumentation.enabled
+        if timed:
+            start = instrumentation.clock()
+        self._set_board_fen(fen)
+        if timed:
+            instrumentation.lap("parse", start)
+
+
+class ArrayBoard(BaseBoard):
+    """
+    A :class:`BaseBoard` that stores a one byte piece code for every playable
+    square and keeps a count of each piece kind, using shared
+    :class:`Piece` instances.
+    Unlike :class:`BaseBoard` the FEN parser rejects squares that are not on
+    the board.
+    :raises: :exc:`ValueError` if the board size is invalid.
+    """
+
+    def _reset_board(self):
+        self._clear_board()
+        fields = self.board_size ** 2 // 2
+        piece_count = (self.board_size // 2 - 1) * (self.board_size // 2)
+        black_man = _piece_code(MAN, BLACK)
+        white_man = _piece_code(MAN, WHITE)
+        self._squares[1:piece_count + 1] = bytes([black_man]) * piece_count
+        self._squares[fields - piece_count + 1:] = bytes([white_man]) * piece_count
+        self._counts[black_man] = self._counts[white_man] = piece_count
+
+    def _clear_board(self):
+        # Index 0 is unused so that square numbers can be used directly.
+        self._squares = bytearray(self.board_size ** 2 // 2 + 1)
+        self._counts = [0] * len(_CODE_PIECES)
+
+    @property
+    def pieces(self):
+        """
+        A read-only snapshot of :func:`piece_map()`, for compatibility with
+        the attribute of :class:`BaseBoard`. Use :func:`set_piece_at()` and
+        :func:`remove_piece_at()` to change the board.
+        """
+        return types.MappingProxyType(self.piece_map())
+
+    def contains_piece(self, piece_type, color):
+        return self._counts[_piece_code(piece_type, color)] > 0
+
+    def set_piece_at(self, square, piece):
+        """Puts a piece on a square, replacing any piece that was there."""
+        if not 0 < square < len(self._squares):
+            raise ValueError("square {} out of range for board_size {}".format(square, self.board_size))
+        code = _piece_code(piece.piece_type, piece.color)
+        if self._squares[square]:
+            self._counts[self._squares[square]] -= 1
+        self._counts[code] += 1
+        self._squares[square] = code
+
+    def remove_piece_at(self, square):
+        """Removes the piece from the given square and returns it, if any."""
+        if not 0 < square < len(self._squares) or not self._squares[square]:
+            return None
+        code = self._squares[square]
+        self._counts[code] -= 1
+        self._squares[square] = 0
+        return _CODE_PIECES[code]
+
+    def copy(self):
+        """Creates a copy of the board."""
+        board = type(self)(None, board_size=self.board_size)
+        board._squares[:] = self._squares
+        board._counts[:] = self._counts
+        return board
+
+    def piece_at(self, square):
+        """Gets the :class:`piece <draughts.Piece>` at the given square."""
+        if 0 < square < len(self._squares):
+            return _CODE_PIECES[self._squares[square]]
+        return None
+
+    def piece_map(self):
+        """Gets a dictionary of :class:`pieces <draughts.Piece>` by square number."""
+        return {square: _CODE_PIECES[code] for square, code in enumerate(self._squares) if code}
+
+    def _set_board_fen(self, fen):
+        fen = fen.strip()
+        parts = fen.split(":")
+        if len(parts) > 3:
+            raise ValueError("expected position part of fen, got multiple parts: {}".format(fen))
+
+        self._clear_board()
+        squares = self._squares
+        counts = self._counts
+        fields = len(squares) - 1
+
+        for part in parts:
+            color = BLACK if part[:1].upper() == "B" else WHITE
+            for part_piece in part[1:].split(","):
+                if not part_piece:
+                    continue
+                piece_type = _FEN_PIECE_TYPES.get(part_piece[0])
+                if piece_type is None:
+                    piece_type = MAN
+                else:
+                    part_piece = part_piece[1:]
+                try:
+                    square = int(part_piece)
+                except ValueError:
+                    raise ValueError("invalid square in fen: {}".format(fen))
+                if not 0 < square <= fields:
+                    raise ValueError("square {} out of range for board_size {}: {}".format(square, self.board_size, fen))
+                code = _piece_code(piece_type, color)
+                if squares[square]:
+                    counts[squares[square]] -= 1
+                counts[code] += 1
+                squares[square] = code
+
+
+class GameReplay:
+    """
+    The positions of a game given by a start position and a list of moves
+    in uci notation, see :func:`BaseBoard.push_uci()`.
+    A copy of the board is kept every *snapshot_interval* plies, so that any
+    position is reached by replaying at most that many moves. Snapshots are
+    created on demand.
+    """
+
+    def __init__(self, board, moves, snapshot_interval=20):
+        if snapshot_interval < 1:
+            raise ValueError("invalid snapshot_interval: {}".format(snapshot_interval))
+        self.moves = list(moves)
+        self.snapshot_interval = snapshot_interval
+        self._snapshots = [board.copy()]
+
+    def __len__(self):
+        return len(self.moves) + 1
+
+    def __iter__(self):
+        """Yields a copy of the board and the lastmove for every ply."""
+        board = self._snapshots[0].copy()
+        yield board.copy(), None
+        for ply, move in enumerate(self.moves, 1):
+            board.push_uci(move)
+            if ply % self.snapshot_interval == 0 and ply // self.snapshot_interval == len(self._snapshots):
+                self._snapshots.append(board.copy())
+            yield board.copy(), move
+
+    def position(self, ply):
+        """
+        Gets a copy of the board after *ply* moves.
+        :raises: :exc:`IndexError` if the ply is out of range and
+            :exc:`ValueError` if one of the moves is invalid.
+        """
+        if ply < 0:
+            ply += len(self)
+        if not 0 <= ply < len(self):
+            raise IndexError("ply out of range: {}".format(ply))
+
+        index = min(ply // self.snapshot_interval, len(self._snapshots) - 1)
+        board = self._snapshots[index].copy()
+        for current in range(index * self.snapshot_interval, ply):
+            board.push_uci(self.moves[current])
+            if (current + 1) % self.snapshot_interval == 0 and (current + 1) // self.snapshot_interval == len(self._snapshots):
+                self._snapshots.append(board.copy())
+        return board
+
+    def lastmove(self, ply):
+        """Gets the move leading to the position after *ply* moves, if any."""
+        return self.moves[ply - 1] if ply > 0 else None
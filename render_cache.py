@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pdraughts
+import draughts_svg
+import draughts_png
+import collections
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+# Part of every content hash, to be bumped when rendering output changes.
+RENDER_VERSION = 1
+
+
+def parse_arrows(arrows):
+    """
+    Parses an arrow specification like ``0622,44`` into a list of
+    :class:`draughts_svg.Arrow` objects. A single square is drawn as a circle.
+    :raises: :exc:`ValueError` if the specification is invalid.
+    """
+    result = []
+    for part in (arrows or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if len(part) == 2:
+            result.append(draughts_svg.Arrow(int(part), int(part)))
+        elif len(part) == 4:
+            result.append(draughts_svg.Arrow(int(part[:2]), int(part[2:])))
+        else:
+            raise ValueError("invalid arrow: {}".format(part))
+    return result
+
+
+def parse_lastmove(lastmove, board_size=10):
+    """
+    Normalizes a lastmove like ``3228`` to a string of two digit square
+    numbers or ``None``.
+    :raises: :exc:`ValueError` if the lastmove is malformed or a square is not
+        on the board.
+    """
+    lastmove = (lastmove or "").strip()
+    if not lastmove:
+        return None
+    if len(lastmove) % 2 or not lastmove.isdigit() or not lastmove.isascii():
+        raise ValueError("invalid lastmove: {}".format(lastmove))
+    fields = board_size ** 2 // 2
+    for i in range(0, len(lastmove), 2):
+        if not 1 <= int(lastmove[i:i + 2]) <= fields:
+            raise ValueError("lastmove square {} out of range for board_size {}: {}".format(
+                int(lastmove[i:i + 2]), board_size, lastmove))
+    return lastmove
+
+
+def parse_orientation(orientation):
+    """
+    Converts ``white`` or ``black`` to the *flipped* argument of
+    :func:`draughts_svg.board()`.
+    :raises: :exc:`ValueError` if the orientation is invalid.
+    """
+    if orientation in (None, "", "white"):
+        return False
+    elif orientation == "black":
+        return True
+    raise ValueError("invalid orientation: {}".format(orientation))
+
+
+def canonical_request(fen, board_size=10, orientation="white", size=360, lastmove=None, arrows=None, style=None):
+    """
+    Parses the parameters of a render request.
+    Returns a tuple of a hashable key, identical for equivalent requests, and
+    the parsed :class:`pdraughts.ArrayBoard`.
+    :raises: :exc:`ValueError` if any of the parameters is invalid.
+    """
+    board = pdraughts.ArrayBoard(fen, board_size=int(board_size))
+    flipped = parse_orientation(orientation)
+    lastmove = parse_lastmove(lastmove, board.board_size)
+    arrows = tuple((arrow.tail, arrow.head) for arrow in parse_arrows(arrows))
+    draughts_svg.validate_arrows(board.board_size, arrows)
+    key = (board.board_fen(), board.board_size, flipped, int(size), lastmove, arrows, style or None)
+    return key, board
+
+
+class LRUCache:
+    """
+    A thread-safe least recently used cache of rendered images, bounded by
+    the total size in bytes of the cached values.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Gets the cached value for *key* or ``None``."""
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Caches *value*, evicting the least recently used entries if needed."""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Gets the hit, miss and eviction counters and the current usage."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class DiskCache:
+    """
+    A persistent cache of rendered images, content addressed by a hex
+    digest. Files are sharded into two levels of subdirectories and written
+    atomically. When the total size exceeds *max_bytes*, the least recently
+    used files are removed until the cache is down to *low_water* of it.
+    Use is recorded in the access time of the files, by :func:`get()` and by
+    :func:`touch()` at most every *touch_interval* seconds per file.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_DISK_BYTES, low_water=0.9, touch_interval=60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.touch_interval = touch_interval
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(stat.st_size for _, stat in self._files())
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:4], digest)
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    pass
+
+    def get(self, digest):
+        """
+        Gets the contents of the cached file or ``None``. Reading marks the
+        file as recently used.
+        """
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if not data:
+            return None
+        try:
+            # Do not rely on the file system to update access times.
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._mark_touched(digest, time.monotonic())
+        return data
+
+    def _mark_touched(self, digest, now):
+        if len(self._touched) >= 4096:
+            # Only a throttle, forgetting it costs a few extra updates.
+            self._touched.clear()
+        self._touched[digest] = now
+
+    def touch(self, digest):
+        """
+        Marks a file as recently used, e.g. when it was served from a memory
+        cache, unless that was done less than *touch_interval* seconds ago.
+        """
+        now = time.monotonic()
+        with self._lock:
+            last = self._touched.get(digest)
+            if last is not None and now - last < self.touch_interval:
+                return
+            self._mark_touched(digest, now)
+        try:
+            os.utime(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def put(self, digest, data):
+        """Atomically writes a file, evicting old files if needed."""
+        path = self._path(digest)
+        shard = os.path.dirname(path)
+        os.makedirs(shard, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=shard, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._lock:
+                try:
+                    replaced = os.stat(path).st_size
+                except FileNotFoundError:
+                    replaced = 0
+                os.replace(tmp, path)
+                self.size += len(data) - replaced
+                self._mark_touched(digest, time.monotonic())
+                if self.size <= self.max_bytes:
+                    return
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently read files down to the low water mark."""
+        with self._lock:
+            files = [(stat.st_atime, path, stat.st_size) for path, stat in self._files()
+                     if not os.path.basename(path).startswith(".tmp-")]
+            files.sort()
+            self.size = sum(size for _, _, size in files)
+            target = self.max_bytes * self.low_water
+            for _, path, size in files:
+                if self.size <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                self.size -= size
+                self.evictions += 1
+
+
+def content_hash(*parts):
+    """Gets a stable hex digest of a canonical request."""
+    return hashlib.sha256(repr((RENDER_VERSION,) + parts).encode("utf-8")).hexdigest()
+
+
+class BoardRenderer:
+    """
+    Renders SVG and PNG images for HTTP API parameters, caching the results
+    in an :class:`LRUCache`.
+    PNG images are converted by *rasterize*, e.g.
+    :func:`draughts_png.RasterPool.rasterize()`, defaulting to
+    :func:`draughts_png.svg2png()` in the calling process.
+    With *direct_png* and without a *style*, PNG images are rendered by
+    :func:`draughts_png.board()` instead.
+    Images missing from the memory cache are looked up in the optional
+    :class:`DiskCache` *disk* before rendering.
+    """
+
+    def __init__(self, cache=None, style=None, rasterize=None, direct_png=False, disk=None):
+        self.cache = cache if cache is not None else LRUCache()
+        self.style = style
+        self.rasterize = rasterize or draughts_png.svg2png
+        self.direct_png = direct_png
+        self.disk = disk
+
+    def request(self, fen, board_size=10, orientation="white", size=360, lastmove=None, arrows=None):
+        """
+        Parses the parameters of a render request like
+        :func:`canonical_request()`, using the stylesheet of the renderer.
+        :raises: :exc:`ValueError` if any of the parameters is invalid.
+        """
+        return canonical_request(fen, board_size, orientation, size, lastmove, arrows, self.style)
+
+    def svg(self, fen, board_size=10, orientation="white", size=360, lastmove=None, arrows=None):
+        """
+        Renders an SVG image as UTF-8 encoded bytes.
+        :raises: :exc:`ValueError` if any of the parameters is invalid.
+        """
+        return self.render("svg", *self.request(fen, board_size, orientation, size, lastmove, arrows))
+
+    def png(self, fen, board_size=10, orientation="white", size=360, lastmove=None, arrows=None):
+        """
+        Renders a PNG image.
+        :raises: :exc:`ValueError` if any of the parameters is invalid.
+        """
+        return self.render("png", *self.request(fen, board_size, orientation, size, lastmove, arrows))
+
+    def etag(self, fmt, key):
+        """
+        Gets the content hash of the image for a key returned by
+        :func:`request()`, suitable as a strong ETag. It does not require
+        rendering the image.
+        """
+        backend = "direct" if fmt == "png" and self.direct_png and not key[-1] else None
+        return content_hash(fmt, backend, key)
+
+    def render(self, fmt, key, board):
+        """
+        Renders an ``svg`` or ``png`` image for a key and board returned by
+        :func:`request()`.
+        """
+        if fmt not in ("svg", "png"):
+            raise ValueError("unsupported format: {}".format(fmt))
+
+        cache_key = (fmt,) + key
+        data = self.cache.get(cache_key)
+        if data is not None:
+            if self.disk is not None:
+                # Keep images that are hot in memory from aging on disk.
+                self.disk.touch(self.etag(fmt, key))
+            return data
+
+        if self.disk is not None:
+            digest = self.etag(fmt, key)
+            data = self.disk.get(digest)
+
+        if data is None:
+            _, _, flipped, size, lastmove, arrows, style = key
+            if fmt == "svg":
+                data = draughts_svg.board(board, flipped=flipped, lastmove=lastmove,
+                                          arrows=[draughts_svg.Arrow(*arrow) for arrow in arrows],
+                                          size=size, style=style).encode("utf-8")
+            elif self.direct_png and not style:
+                data = draughts_png.board(board, flipped=flipped, lastmove=lastmove, arrows=arrows, size=size)
+            else:
+                data = self.rasterize(self.render("svg", key, board))
+            if self.disk is not None:
+                self.disk.put(digest, data)
+
+        self.cache.put(cache_key, data)
+        return data
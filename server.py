@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""An HTTP service that renders draughts board images."""
+
+import render_cache
+import draughts_png
+import instrumentation
+import argparse
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import urllib.parse
+
+
+logger = logging.getLogger(__name__)
+
+BOARD_SIZES = (8, 10)
+
+
+CONTENT_TYPES = {
+    "svg": "image/svg+xml",
+    "png": "image/png",
+}
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Service:
+    """
+    Serves ``/board.svg`` and ``/board.png``. Rendering runs in *executor*,
+    and concurrent requests for the same image share a single render.
+    With an :class:`instrumentation.Registry`, ``/metrics`` serves stage
+    timings and cache counters in the Prometheus text format.
+    Images carry their content hash as a strong ``ETag``, so that
+    conditional requests are answered without rendering.
+    """
+
+    def __init__(self, renderer, executor=None, registry=None):
+        self.renderer = renderer
+        self.executor = executor
+        self.registry = registry
+        self.coalesced = 0
+        self._inflight = {}
+
+    def metrics(self):
+        lines = [self.registry.prometheus()]
+        stats = self.renderer.cache.stats()
+        for name in ["hits", "misses", "evictions"]:
+            lines.append("# TYPE boardimage_cache_%s_total counter\nboardimage_cache_%s_total %d\n" % (name, name, stats[name]))
+        for name in ["entries", "bytes"]:
+            lines.append("# TYPE boardimage_cache_%s gauge\nboardimage_cache_%s %d\n" % (name, name, stats[name]))
+        if self.renderer.disk is not None:
+            lines.append("# TYPE boardimage_disk_cache_evictions_total counter\nboardimage_disk_cache_evictions_total %d\n" % self.renderer.disk.evictions)
+            lines.append("# TYPE boardimage_disk_cache_bytes gauge\nboardimage_disk_cache_bytes %d\n" % self.renderer.disk.size)
+        lines.append("# TYPE boardimage_coalesced_total counter\nboardimage_coalesced_total %d\n" % self.coalesced)
+        return "".join(lines).encode("utf-8")
+
+    def parse(self, query):
+        params = urllib.parse.parse_qs(query)
+
+        def get(name, default=None):
+            values = params.get(name)
+            return values[0] if values else default
+
+        fen = get("fen")
+        if not fen:
+            raise HttpError(400, "fen required")
+        try:
+            size = min(max(int(get("size", 360)), 16), 1024)
+            board_size = int(get("boardSize", 10))
+            if board_size not in BOARD_SIZES:
+                raise ValueError("unsupported boardSize: {}".format(board_size))
+            return self.renderer.request(fen, board_size=board_size, orientation=get("orientation", "white"),
+                                         size=size, lastmove=get("lastMove"), arrows=get("arrows"))
+        except ValueError as err:
+            raise HttpError(400, str(err))
+
+    async def render(self, fmt, key, board):
+        """Renders an image, joining an identical render that is in flight."""
+        inflight_key = (fmt,) + key
+        future = self._inflight.get(inflight_key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self.renderer.render, fmt, key, board)
+            self._inflight[inflight_key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        else:
+            self.coalesced += 1
+
+        try:
+            # Shielded so that a client going away does not cancel the
+            # render for the others.
+            return await asyncio.shield(future)
+        except draughts_png.QueueFull as err:
+            raise HttpError(503, str(err))
+        except multiprocessing.TimeoutError:
+            raise HttpError(503, "rendering timed out")
+
+    async def respond(self, method, target, headers=None):
+        """
+        Returns the status, content type, body and additional headers for a
+        request.
+        """
+        url = urllib.parse.urlsplit(target)
+        if url.path == "/metrics" and self.registry is not None:
+            return 200, "text/plain; version=0.0.4", self.metrics(), []
+        fmt = {"/board.svg": "svg", "/board.png": "png"}.get(url.path)
+        if fmt is None:
+            raise HttpError(404, "not found")
+        if method not in ("GET", "HEAD"):
+            raise HttpError(405, "method not allowed")
+        key, board = self.parse(url.query)
+
+        etag = '"%s"' % self.renderer.etag(fmt, key)
+        # Clients may store images, but must revalidate them, because the
+        # stylesheet or the renderer can change between restarts.
+        extra = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if_none_match = (headers or {}).get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return 304, CONTENT_TYPES[fmt], b"", extra
+        return 200, CONTENT_TYPES[fmt], await self.render(fmt, key, board), extra
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.write(writer, 400, "text/plain", b"bad request", False)
+                    break
+
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+                extra = []
+                try:
+                    status, content_type, body, extra = await self.respond(method, target, headers)
+                except HttpError as err:
+                    status, content_type, body = err.status, "text/plain", str(err).encode("utf-8")
+                except Exception:
+                    logger.exception("error handling %s %s", method, target)
+                    status, content_type, body = 500, "text/plain", b"internal server error"
+
+                await self.write(writer, status, content_type, body if method != "HEAD" else b"", keep_alive,
+                                 content_length=len(body), headers=extra)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def write(self, writer, status, content_type, body, keep_alive, content_length=None, headers=()):
+        head = [
+            "HTTP/1.1 %d %s" % (status, REASONS[status]),
+            "Content-Type: %s" % content_type,
+            "Content-Length: %d" % (len(body) if content_length is None else content_length),
+            "Connection: %s" % ("keep-alive" if keep_alive else "close"),
+        ]
+        head.extend("%s: %s" % header for header in headers)
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def _etag_matches(if_none_match, etag):
+    """Compares an ``If-None-Match`` header weakly, as required for GET."""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+async def serve(service, bind, port):
+    server = await asyncio.start_server(service.handle, bind, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", "-p", type=int, default=8080, help="web server port")
+    parser.add_argument("--bind", default="127.0.0.1", help="bind address (default: 127.0.0.1)")
+    parser.add_argument("--css", type=argparse.FileType("r"), help="stylesheet to include in the images")
+    parser.add_argument("--processes", type=int, default=0, help="rasterize PNG images in a pool of worker processes")
+    parser.add_argument("--queue", type=int, default=64, help="maximum pending jobs of the worker processes")
+    parser.add_argument("--cache-size", type=int, default=64, help="size of the image cache in MiB")
+    parser.add_argument("--cache-dir", help="also keep rendered images in this directory")
+    parser.add_argument("--disk-cache-size", type=int, default=1024, help="size of the --cache-dir cache in MiB")
+    parser.add_argument("--direct-png", action="store_true", help="render PNG images without SVG when no --css is given")
+    parser.add_argument("--metrics", action="store_true", help="time rendering stages and serve them at /metrics")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    registry = None
+    if args.metrics:
+        registry = instrumentation.Registry()
+        instrumentation.add_sink(registry)
+
+    style = args.css.read() if args.css else None
+    pool = draughts_png.RasterPool(args.processes, max_queue=args.queue) if args.processes else None
+    disk = render_cache.DiskCache(args.cache_dir, args.disk_cache_size * 1024 * 1024) if args.cache_dir else None
+    renderer = render_cache.BoardRenderer(render_cache.LRUCache(args.cache_size * 1024 * 1024), style=style,
+                                          rasterize=pool.rasterize if pool else None, direct_png=args.direct_png,
+                                          disk=disk)
+
+    with concurrent.futures.ThreadPoolExecutor(max(4, args.processes * 2)) as executor:
+        try:
+            asyncio.run(serve(Service(renderer, executor, registry), args.bind, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Round trip tests for the animated exports, decoded with Pillow."""
+
+import pdraughts
+import draughts_anim
+import draughts_png
+import io
+import random
+import re
+import struct
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+
+GAME = ["3228", "1923", "2819", "1423", "3328", "2332", "3728"]
+
+PIECE_COLORS = {
+    "white-man": "#f0f0f0", "white-king": "#e0c040",
+    "black-man": "#202020", "black-king": "#8040c0",
+    "white-ghostman": "#c0f0c0", "white-ghostking": "#c0c0f0",
+    "black-ghostman": "#406040", "black-ghostking": "#404060",
+}
+
+
+def _svg2png(svg):
+    # Piece tiles without antialiasing, so that the exports are compared to
+    # board_rgb() independently of CairoSVG.
+    width, height = map(int, re.search(r'width="(\d+)" height="(\d+)" preserve', svg).groups())
+    fill = re.search(r'fill="(#\w+)" />', svg).group(1)
+    piece = re.search(r'xlink:href="#([\w-]+)"', svg).group(1)
+    image = Image.new("RGB", (width, height), fill)
+    ImageDraw.Draw(image).ellipse((2, 2, width - 3, height - 3), fill=PIECE_COLORS[piece])
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def tiles(monkeypatch):
+    monkeypatch.setattr(draughts_png, "svg2png", _svg2png)
+    monkeypatch.setattr(draughts_png, "_TILES", {})
+
+
+def _replay(moves=GAME):
+    return pdraughts.GameReplay(pdraughts.ArrayBoard(), moves, snapshot_interval=3)
+
+
+def _expected(replay, size, flipped=False):
+    return [b"".join(draughts_png.board_rgb(board, flipped=flipped, lastmove=lastmove, size=size)[2])
+            for board, lastmove in replay]
+
+
+def _decoded(data):
+    image = Image.open(io.BytesIO(data))
+    frames, durations = [], []
+    for index in range(image.n_frames):
+        image.seek(index)
+        frames.append(image.convert("RGB").tobytes())
+        durations.append(image.info.get("duration"))
+    return image, frames, durations
+
+
+@pytest.mark.parametrize("flipped", [False, True])
+def test_apng(flipped):
+    replay = _replay()
+    out = io.BytesIO()
+    draughts_anim.export_apng(out, replay, delay=[100 * (i + 1) for i in range(len(replay))], flipped=flipped, size=90)
+
+    image, frames, durations = _decoded(out.getvalue())
+    assert image.format == "PNG"
+    assert frames == _expected(replay, 90, flipped)
+    assert durations == [100 * (i + 1) for i in range(len(replay))]
+
+
+def test_apng_sequence_numbers():
+    out = io.BytesIO()
+    draughts_anim.export_apng(out, _replay(), size=60)
+    data = out.getvalue()
+
+    sequence = []
+    offset = len(draughts_png._PNG_SIGNATURE)
+    while offset < len(data):
+        length, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        if kind in (b"fcTL", b"fdAT"):
+            sequence.append(struct.unpack(">I", data[offset + 8:offset + 12])[0])
+        offset += length + 12
+    assert sequence == list(range(len(sequence)))
+    # One fcTL per frame and one fdAT per frame after the first.
+    assert len(sequence) == 2 * len(GAME) + 1
+
+
+@pytest.mark.parametrize("flipped", [False, True])
+def test_gif(flipped):
+    replay = _replay()
+    out = io.BytesIO()
+    draughts_anim.export_gif(out, replay, delay=250.0, flipped=flipped, size=90)
+
+    image, frames, durations = _decoded(out.getvalue())
+    assert image.format == "GIF"
+    assert frames == _expected(replay, 90, flipped)
+    assert durations == [250] * len(replay)
+
+
+def test_identical_frames():
+    board = pdraughts.ArrayBoard()
+    frames = [(board, None), (board, None), (board, "3227")]
+    expected = [b"".join(draughts_png.board_rgb(board, lastmove=lastmove, size=60)[2]) for _, lastmove in frames]
+    for export in [draughts_anim.export_apng, draughts_anim.export_gif]:
+        out = io.BytesIO()
+        export(out, iter(frames), size=60)
+        assert _decoded(out.getvalue())[1] == expected
+
+
+def test_sprite_sheet():
+    replay = _replay()
+    out = io.BytesIO()
+    draughts_anim.export_sprite_sheet(out, replay, size=60)
+
+    image = Image.open(io.BytesIO(out.getvalue()))
+    assert image.size == (60, 60 * len(replay))
+    assert image.convert("RGB").tobytes() == b"".join(_expected(replay, 60))
+
+
+def test_lzw():
+    # Enough distinct sequences to fill the code table and start over.
+    rng = random.Random(0)
+    indices = bytes(rng.choice([0, 1, 2, 3, 4, 5, 250, 255]) for _ in range(200 * 150))
+    colors = b"".join(bytes([i, 255 - i, i // 2]) for i in range(256))
+    data = b"GIF89a" + struct.pack("<HHBBB", 200, 150, 0xf7, 0, 0) + colors
+    data += b"," + struct.pack("<HHHHB", 0, 0, 200, 150, 0)
+    data += b"\x08" + draughts_anim._sub_blocks(draughts_anim._lzw(indices)) + b";"
+
+    image = Image.open(io.BytesIO(data))
+    assert image.tobytes() == indices
+
+
+@pytest.mark.parametrize("export", [draughts_anim.export_apng, draughts_anim.export_gif])
+@pytest.mark.parametrize("delay", [[100, 200], [100] * 9, [100] * 7 + [-1], 70000 * 10])
+def test_invalid_delays(export, delay):
+    out = io.BytesIO()
+    with pytest.raises(ValueError):
+        export(out, _replay(), delay=delay, size=60)
+    assert out.getvalue() == b""
+
+
+def test_delay_range():
+    with pytest.raises(ValueError):
+        draughts_anim.export_apng(io.BytesIO(), _replay(), delay=70000, size=60)
+
+    # GIF stores hundredths of a second.
+    out = io.BytesIO()
+    draughts_anim.export_gif(out, _replay(["3228"]), delay=70000, size=60)
+    assert _decoded(out.getvalue())[2] == [70000, 70000]
+
+
+@pytest.mark.parametrize("export", [draughts_anim.export_apng, draughts_anim.export_gif, draughts_anim.export_sprite_sheet])
+def test_no_frames(export):
+    out = io.BytesIO()
+    with pytest.raises(ValueError):
+        export(out, [])
+    assert out.getvalue() == b""
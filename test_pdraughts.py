@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Tests for applying moves with push_uci() and replaying games."""
+
+import pdraughts
+import pytest
+
+
+BOARDS = [pdraughts.BaseBoard, pdraughts.ArrayBoard]
+
+GAME = ["3228", "1923", "2819", "1423", "3328", "2332", "3728"]
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_move(board_type):
+    board = board_type("W:W32:B19")
+    assert board.push_uci("3228") == []
+    assert board.piece_at(32) is None
+    assert board.piece_at(28) == pdraughts.Piece(pdraughts.MAN, pdraughts.WHITE)
+    assert board.board_fen() == "W28:B19"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_single_capture(board_type):
+    board = board_type("W:W32:B27")
+    assert board.push_uci("3221") == [27]
+    assert board.board_fen() == "W21:B"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_capture_chain(board_type):
+    # From 32 over 27 to 21, then over 17 to 12.
+    board = board_type("W:W32:B27,17,18")
+    assert board.push_uci("322112") == [27, 17]
+    assert board.board_fen() == "W12:B18"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_capture_chain_docstring(board_type):
+    # The example of the push_uci() docstring: 23 to 14 passes 19, and
+    # 19 to 32 passes 23 and 28.
+    board = board_type("W:W23:B19,28")
+    assert board.push_uci("23141932") == [19, 28]
+    assert board.board_fen() == "W32:B"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_own_pieces_are_not_captured(board_type):
+    board = board_type("W:W32,27:B1")
+    with pytest.raises(ValueError):
+        board.push_uci("3227")
+    assert board.push_uci("3221") == []
+    assert board.board_fen() == "W21,27:B1"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+@pytest.mark.parametrize("board_size, fen, uci, square", [
+    (10, "W:W6:B50", "0601", 1),
+    (10, "W:W1:B45", "4550", 50),
+    (8, "W:W5:B32", "0501", 1),
+    (8, "W:W1:B28", "2832", 32),
+])
+def test_promotion(board_type, board_size, fen, uci, square):
+    board = board_type(fen, board_size=board_size)
+    color = board.piece_at(int(uci[:2])).color
+    board.push_uci(uci)
+    assert board.piece_at(square) == pdraughts.Piece(pdraughts.KING, color)
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_no_promotion(board_type):
+    board = board_type("W:W12:B39")
+    board.push_uci("1207")
+    board.push_uci("3944")
+    assert board.piece_at(7) == pdraughts.Piece(pdraughts.MAN, pdraughts.WHITE)
+    assert board.piece_at(44) == pdraughts.Piece(pdraughts.MAN, pdraughts.BLACK)
+
+    # Black men are not promoted on the first row.
+    board = board_type("W:W50:B6")
+    board.push_uci("0601")
+    assert board.piece_at(1) == pdraughts.Piece(pdraughts.MAN, pdraughts.BLACK)
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+@pytest.mark.parametrize("uci", [
+    "3231",  # Same row.
+    "3222",  # Same column.
+    "3224",  # Two rows, four columns.
+    "3232",  # Not a move.
+])
+def test_not_diagonal(board_type, uci):
+    board = board_type("W:W32:B1")
+    with pytest.raises(ValueError):
+        board.push_uci(uci)
+    assert board.board_fen() == "W32:B1"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+@pytest.mark.parametrize("board_size, uci", [
+    (10, "3251"),
+    (10, "0032"),
+    (10, "3299"),
+    (8, "3233"),
+    (8, "3237"),
+])
+def test_off_board(board_type, board_size, uci):
+    board = board_type("W:W32:B1", board_size=board_size)
+    with pytest.raises(ValueError):
+        board.push_uci(uci)
+    assert board.board_fen() == "W32:B1"
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+@pytest.mark.parametrize("uci", ["", "32", "322", "32x8"])
+def test_invalid_uci(board_type, uci):
+    with pytest.raises(ValueError):
+        board_type("W:W32:B1").push_uci(uci)
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+def test_missing_piece_and_occupied_square(board_type):
+    board = board_type("W:W32,28:B1")
+    with pytest.raises(ValueError):
+        board.push_uci("3329")
+    with pytest.raises(ValueError):
+        board.push_uci("3228")
+
+
+def test_array_board_pieces():
+    board = pdraughts.ArrayBoard("W:W32:B19")
+    assert board.pieces == {32: pdraughts.Piece(pdraughts.MAN, pdraughts.WHITE), 19: pdraughts.Piece(pdraughts.MAN, pdraughts.BLACK)}
+    with pytest.raises(TypeError):
+        board.pieces[28] = pdraughts.Piece(pdraughts.KING, pdraughts.WHITE)
+    with pytest.raises(TypeError):
+        del board.pieces[32]
+    assert board.board_fen() == "W32:B19"
+
+
+def _sequential(board, moves):
+    positions = [board.copy()]
+    for move in moves:
+        board.push_uci(move)
+        positions.append(board.copy())
+    return [position.board_fen() for position in positions]
+
+
+@pytest.mark.parametrize("board_type", BOARDS)
+@pytest.mark.parametrize("snapshot_interval", [1, 2, 3, 5, 20])
+def test_replay_position(board_type, snapshot_interval):
+    expected = _sequential(board_type(), GAME)
+
+    replay = pdraughts.GameReplay(board_type(), GAME, snapshot_interval=snapshot_interval)
+    assert len(replay) == len(GAME) + 1
+    # Backwards first, so that snapshots are created on the way to the end.
+    for ply in reversed(range(len(replay))):
+        assert replay.position(ply).board_fen() == expected[ply]
+    for ply in range(len(replay)):
+        assert replay.position(ply).board_fen() == expected[ply]
+        assert replay.lastmove(ply) == (GAME[ply - 1] if ply else None)
+    assert replay.position(-1).board_fen() == expected[-1]
+
+
+@pytest.mark.parametrize("snapshot_interval", [1, 3, 20])
+def test_replay_iter(snapshot_interval):
+    expected = _sequential(pdraughts.ArrayBoard(), GAME)
+
+    replay = pdraughts.GameReplay(pdraughts.ArrayBoard(), GAME, snapshot_interval=snapshot_interval)
+    assert [(board.board_fen(), lastmove) for board, lastmove in replay] == list(zip(expected, [None] + GAME))
+    # Snapshots from iterating are used by position().
+    assert replay.position(len(GAME)).board_fen() == expected[-1]
+
+
+def test_replay_copies():
+    start = pdraughts.ArrayBoard()
+    replay = pdraughts.GameReplay(start, GAME, snapshot_interval=2)
+    position = replay.position(3)
+    position.push_uci("3732")
+    assert replay.position(3).board_fen() != position.board_fen()
+    assert start.board_fen() == pdraughts.ArrayBoard().board_fen()
+
+
+def test_replay_errors():
+    replay = pdraughts.GameReplay(pdraughts.ArrayBoard(), GAME)
+    with pytest.raises(IndexError):
+        replay.position(len(GAME) + 1)
+    with pytest.raises(IndexError):
+        replay.position(-len(GAME) - 2)
+    with pytest.raises(ValueError):
+        pdraughts.GameReplay(pdraughts.ArrayBoard(), GAME, snapshot_interval=0)
+    with pytest.raises(ValueError):
+        pdraughts.GameReplay(pdraughts.ArrayBoard(), ["3299"]).position(1)